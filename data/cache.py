@@ -0,0 +1,114 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from .columnar import np, require_numpy
+
+# Bumped whenever the layout of the cached columns changes, invalidating every older entry
+CACHE_VERSION = 2
+
+
+def cache_key(filename, delimiter, class_attr, id_attr=None):
+    """
+    Builds the key of a parsed data set, from the content of its file and the options it is parsed with, so editing the
+    file or changing any of the options leads to another entry
+
+    :param string filename: The CSV file
+    :param string delimiter: The delimiter of the values
+    :param string class_attr: The class attribute
+    :param string id_attr: The removed id attribute, if any
+    :return: A hexadecimal key
+    :rtype: string
+    """
+
+    content_hash = hashlib.sha256()
+
+    with open(filename, "rb") as csv_file:
+        for block in iter(lambda: csv_file.read(1 << 20), b""):
+            content_hash.update(block)
+
+    options = json.dumps([CACHE_VERSION, content_hash.hexdigest(), delimiter, class_attr, id_attr])
+
+    return hashlib.sha256(options.encode("utf-8")).hexdigest()
+
+
+def load_columns(cache_dir, key):
+    """
+    Loads the columns of a cached data set, memory-mapping them
+
+    :param string cache_dir: The cache directory
+    :param string key: The key of the data set, as given by cache_key
+    :return: A tuple with the header, the read-only columns and their dictionaries (None for the columns not encoded),
+    or None if the data set is not cached
+    :rtype: tuple
+    """
+
+    require_numpy()
+
+    entry = os.path.join(cache_dir, key)
+
+    # A missing or damaged file of the entry, as after removing some of them by hand, is a miss as well
+    try:
+        with open(os.path.join(entry, "metadata.json"), "r") as metadata_file:
+            metadata = json.load(metadata_file)
+
+        columns = [np.load(os.path.join(entry, "%d.npy" % idx_column), mmap_mode="r")
+                   for idx_column in range(0, len(metadata["header"]))]
+
+        dictionaries = [np.load(os.path.join(entry, "%d.labels.npy" % idx_column)) if encoded else None
+                        for idx_column, encoded in enumerate(metadata["encoded"])]
+
+    except (IOError, OSError, ValueError):
+        return None
+
+    return metadata["header"], columns, dictionaries
+
+
+def save_columns(cache_dir, key, header, columns, dictionaries):
+    """
+    Saves the columns of a parsed data set, one .npy file per column. The entry is written aside and then renamed into
+    place, so a concurrent or interrupted run never sees it half written
+
+    :param string cache_dir: The cache directory
+    :param string key: The key of the data set, as given by cache_key
+    :param list header: The attribute names, in the order of the columns
+    :param list columns: The typed columns, or the codes of the dictionary-encoded ones
+    :param list dictionaries: The dictionary of each column, or None for the columns not encoded
+    """
+
+    require_numpy()
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    staging = tempfile.mkdtemp(dir=cache_dir)
+
+    try:
+        for idx_column, (column, dictionary) in enumerate(zip(columns, dictionaries)):
+            np.save(os.path.join(staging, "%d.npy" % idx_column), column)
+
+            if dictionary is not None:
+                np.save(os.path.join(staging, "%d.labels.npy" % idx_column), dictionary)
+
+        metadata = {"header": list(header), "encoded": [dictionary is not None for dictionary in dictionaries],
+                    "version": CACHE_VERSION}
+
+        with open(os.path.join(staging, "metadata.json"), "w") as metadata_file:
+            json.dump(metadata, metadata_file)
+
+        os.rename(staging, os.path.join(cache_dir, key))
+
+    except OSError:
+        # Another run already cached the same data set
+        if not os.path.isdir(os.path.join(cache_dir, key)):
+            raise
+
+    finally:
+        if os.path.isdir(staging):
+            shutil.rmtree(staging)
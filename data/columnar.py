@@ -0,0 +1,158 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def require_numpy():
+    """
+    Ensures NumPy is available for the columnar backend
+
+    :raises ImportError: If NumPy is not installed
+    """
+
+    if np is None:
+        raise ImportError("The columnar backend requires NumPy to be installed")
+
+
+def read_only(array):
+    """
+    Flags a NumPy array as non writeable, so it can be shared without copies
+
+    :param numpy.ndarray array: The array to protect
+    :return: The same array, now read-only
+    :rtype: numpy.ndarray
+    """
+
+    array.flags.writeable = False
+
+    return array
+
+
+def to_column(values):
+    """
+    Converts a sequence of raw string values into a typed column. Columns where every value is numeric become float64
+    arrays, the others are kept as unicode arrays
+
+    :param list values: The raw values of the column
+    :return: A read-only typed column
+    :rtype: numpy.ndarray
+    """
+
+    stripped = [value.strip() if hasattr(value, "strip") else value for value in values]
+
+    try:
+        column = np.array(stripped, dtype=np.float64)
+    except ValueError:
+        column = np.array(stripped, dtype=np.str_)
+
+    return read_only(column)
+
+
+def encode_column(column):
+    """
+    Dictionary-encodes a column as small integer codes, indexing an array with its distinct values
+
+    :param numpy.ndarray column: The column to encode
+    :return: A tuple with the read-only codes and the read-only dictionary
+    :rtype: tuple
+    """
+
+    labels, codes = np.unique(column, return_inverse=True)
+
+    return read_only(codes.reshape(-1).astype(np.int32)), read_only(labels)
+
+
+def decode_values(codes, labels):
+    """
+    Decodes the codes of a dictionary-encoded column into a list, sharing a single object per distinct value
+
+    :param numpy.ndarray codes: The codes
+    :param numpy.ndarray labels: The dictionary
+    :return: The values
+    :rtype: list
+    """
+
+    labels = labels.tolist()
+
+    return [labels[code] for code in codes.tolist()]
+
+
+def quantile_bins(column, max_bins=255, weights=None):
+    """
+    Bins a numeric column into at most max_bins bins holding about as many values each. Columns with few distinct
+    values get a bin per value. The edges are values of the column, so splitting after a bin is a cut point like the
+    ones of the discretizations: the values lower or equal to it and the greater ones
+
+    :param numpy.ndarray column: The numeric column
+    :param integer max_bins: Maximum number of bins, up to 256
+    :param numpy.ndarray weights: The number of times each value counts, as in a weighted subset. The bins are the same
+    as the ones of the column with each value repeated that many times
+    :return: A tuple with the read-only bin of each value, as uint8 codes, and the read-only sorted upper edge of each
+    bin but the last one
+    :rtype: tuple
+    """
+
+    if not 2 <= max_bins <= 256:
+        raise AttributeError("Number of bins outside of 2 to 256 is not supported!")
+
+    order = np.argsort(column, kind="stable")
+    sorted_column = column[order]
+
+    if weights is None:
+        cumulative_weights = np.arange(1, len(column) + 1)
+    else:
+        cumulative_weights = np.cumsum(np.asarray(weights)[order])
+
+        # Values that do not count are not in the column the bins stand for
+        counted = np.diff(np.concatenate(([0], cumulative_weights))) > 0
+
+        sorted_column = sorted_column[counted]
+        cumulative_weights = cumulative_weights[counted]
+
+    distinct = np.unique(sorted_column)
+
+    if len(distinct) <= max_bins:
+        edges = distinct[:-1]
+    else:
+        # The value at each quantile position of the repeated column, which is the first one whose cumulative weight
+        # goes past it
+        positions = (np.arange(1, max_bins) * int(cumulative_weights[-1])) // max_bins
+        edges = np.unique(sorted_column[np.searchsorted(cumulative_weights, positions, side="right")])
+
+        # The maximum as an edge would only leave the last bin empty
+        edges = edges[edges < distinct[-1]]
+
+    codes = np.searchsorted(edges, column, side="left").astype(np.uint8)
+
+    return read_only(codes), read_only(edges)
+
+
+def is_numeric(column):
+    return column.dtype.kind == "f"
+
+
+def normalize_column(column):
+    """
+    Normalizes a numeric column with the z-score, rounding to 3 decimal places. Non numeric or constant columns are
+    returned untouched
+
+    :param numpy.ndarray column: The column to normalize
+    :return: The normalized column
+    :rtype: numpy.ndarray
+    """
+
+    if not is_numeric(column) or len(column) < 2:
+        return column
+
+    std_deviation = column.std(ddof=1)
+
+    if std_deviation == 0:
+        return column
+
+    return read_only(np.round((column - column.mean()) / std_deviation, 3))
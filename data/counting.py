@@ -0,0 +1,160 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import math
+
+from .columnar import np
+
+
+def entropy_from_counts(counts):
+    """
+    Calculates the entropy of a distribution given by its counts
+
+    :param list counts: The number of occurrences of each class
+    :return: The entropy, in bits
+    :rtype: float
+    """
+
+    total = sum(counts)
+
+    info = 0
+
+    for count in counts:
+        if count > 0:
+            pi = count / total
+
+            info -= pi * math.log(pi, 2)
+
+    return info
+
+
+def first_appearance_codes(values):
+    """
+    Encodes a NumPy array as integer codes, numbering the distinct values in order of first appearance
+
+    :param numpy.ndarray values: The values to encode
+    :return: A tuple with the distinct values (as a list) and the code of each item
+    :rtype: tuple
+    """
+
+    uniques, first_idx, inverse = np.unique(values, return_index=True, return_inverse=True)
+
+    order = np.argsort(first_idx, kind="stable")
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+
+    return uniques[order].tolist(), rank[inverse.reshape(-1)]
+
+
+class ContingencyTable(object):
+    """
+    Counts of (attribute value x class) pairs over a set of instances, from which entropy and information gain are
+    derived without filtering the data
+
+    """
+
+    values = []
+    classes = []
+    counts = []
+
+    def __init__(self, values, classes, counts):
+        """
+        Constructor of the class
+
+        :param list values: The distinct attribute values, in order of first appearance
+        :param list classes: The distinct classes, in order of first appearance
+        :param list counts: A list with, for each value, the count of each class
+        """
+
+        self.values = values
+        self.classes = classes
+        self.counts = counts
+
+    @staticmethod
+    def count(attr_values, class_values, weights=None):
+        """
+        Builds the table in a single pass over the instances
+
+        :param list attr_values: The attribute value of each instance
+        :param list class_values: The class of each instance
+        :param list weights: If given, the number of times each instance is counted
+        :return: The contingency table
+        :rtype: ContingencyTable
+        """
+
+        rows = {}
+        classes = {}
+
+        if weights is None:
+            weights = [1] * len(class_values)
+
+        for value, yi, weight in zip(attr_values, class_values, weights):
+            row = rows.get(value)
+
+            if row is None:
+                row = rows[value] = {}
+
+            row[yi] = row.get(yi, 0) + weight
+
+            if yi not in classes:
+                classes[yi] = len(classes)
+
+        counts = [[row.get(yi, 0) for yi in classes] for row in rows.values()]
+
+        return ContingencyTable(list(rows), list(classes), counts)
+
+    @staticmethod
+    def count_codes(attr_values, class_codes, classes, weights=None):
+        """
+        Builds the table from NumPy columns, with the classes already encoded, so the encoding can be shared by every
+        attribute of a node
+
+        :param numpy.ndarray attr_values: The attribute value of each instance
+        :param numpy.ndarray class_codes: The class code of each instance
+        :param list classes: The classes, indexed by their codes
+        :param numpy.ndarray weights: If given, the integer number of times each instance is counted
+        :return: The contingency table
+        :rtype: ContingencyTable
+        """
+
+        values, value_codes = first_appearance_codes(attr_values)
+
+        counts = np.bincount(value_codes * len(classes) + class_codes, weights, minlength=len(values) * len(classes))
+
+        if weights is not None:
+            counts = counts.astype(np.int64)
+
+        return ContingencyTable(values, classes, counts.reshape(len(values), len(classes)).tolist())
+
+    def value_counts(self):
+        return [sum(row) for row in self.counts]
+
+    def class_counts(self):
+        return [sum(column) for column in zip(*self.counts)]
+
+    def total(self):
+        return sum(self.value_counts())
+
+    def entropy(self):
+        return entropy_from_counts(self.class_counts())
+
+    def mean_entropy(self):
+        """
+        The entropy of the classes after splitting by the attribute, weighted by the size of each partition
+
+        :return: The mean entropy, in bits
+        :rtype: float
+        """
+
+        total = self.total()
+
+        info_attr = 0
+
+        for row in self.counts:
+            info_attr += (sum(row) / total) * entropy_from_counts(row)
+
+        return info_attr
+
+    def information_gain(self):
+        return self.entropy() - self.mean_entropy()
@@ -0,0 +1,204 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import json
+
+from .thresholds import as_list, best_threshold, mdl_cut_points, interval_label
+
+
+class Discretizer(object):
+    """
+    Discretizes the numeric attributes into intervals. The cut points of each attribute are fitted once, and can then be
+    saved and reused to transform other data, like later runs or new instances to classify
+
+    """
+
+    kind = None
+    _cut_points = None
+
+    def __init__(self, cut_points=None):
+        """
+        Constructor of the class
+
+        :param dict cut_points: Already fitted cut points, like {<attribute>: [<cut point>, ...]}
+        """
+
+        self._cut_points = dict(cut_points) if cut_points is not None else None
+
+    def _fit_attributes(self, data_handler, attributes):
+        raise NotImplementedError()
+
+    def is_fitted(self):
+        return self._cut_points is not None
+
+    def cut_points(self):
+        """
+        :return: The sorted cut points of each attribute, like {<attribute>: [<cut point>, ...]}
+        :rtype: dict
+        """
+
+        if not self.is_fitted():
+            raise AttributeError("Cut points before fit is not supported!")
+
+        return {attr: list(self._cut_points[attr]) for attr in self._cut_points}
+
+    def fit(self, data_handler):
+        """
+        Finds the cut points of each numeric attribute
+
+        :param DataHandler data_handler: The data to fit
+        :return: The discretizer itself
+        :rtype: Discretizer
+        """
+
+        self._cut_points = self._fit_attributes(data_handler, data_handler.numeric_attributes())
+
+        return self
+
+    def transform(self, data_handler):
+        """
+        Replaces the values of the fitted attributes by the labels of the intervals that hold them
+
+        :param DataHandler data_handler: The data to discretize
+        :return: A DataHandler with the discretized data
+        :rtype: DataHandler
+        """
+
+        attributes = set(data_handler.numeric_attributes())
+
+        return data_handler.discretize_by({attr: cut_points for attr, cut_points in self.cut_points().items()
+                                           if attr in attributes})
+
+    def fit_transform(self, data_handler):
+        return self.fit(data_handler).transform(data_handler)
+
+    def transform_instances(self, instances, attributes):
+        """
+        Discretizes instances given as attribute tuples, like a batch read from a stream
+
+        :param list instances: A list of attribute tuples like [(<attributes>), ...]
+        :param list attributes: The name of each attribute of the tuples
+        :return: The instances, with the numeric values of the fitted attributes replaced by interval labels
+        :rtype: list
+        """
+
+        cut_points = self.cut_points()
+        attributes_cut_points = [cut_points.get(attr) for attr in attributes]
+
+        return [tuple(interval_label(value, attr_cut_points) if attr_cut_points and isinstance(value, float) else value
+                      for value, attr_cut_points in zip(instance, attributes_cut_points))
+                for instance in instances]
+
+    def save(self, path):
+        """
+        Saves the kind and the cut points of the discretizer to a JSON file
+
+        :param string path: The file to write
+        """
+
+        with open(path, "w") as discretizer_file:
+            json.dump({"kind": self.kind, "cut_points": self.cut_points()}, discretizer_file)
+
+
+class MeanDiscretizer(Discretizer):
+    """
+    Splits each attribute at its mean, rounded to 3 decimal places
+
+    """
+
+    kind = "mean"
+
+    def _fit_attributes(self, data_handler, attributes):
+        return {attr: [float("{0:.3f}".format(data_handler.get_average_for_attr(attr)))] for attr in attributes}
+
+
+class QuartileDiscretizer(Discretizer):
+    """
+    Splits each attribute at its quartiles
+
+    """
+
+    kind = "quartiles"
+
+    def _fit_attributes(self, data_handler, attributes):
+        return {attr: data_handler.generate_quartiles(sorted(as_list(data_handler.attribute_values(attr))))
+                for attr in attributes}
+
+
+class InformationGainDiscretizer(Discretizer):
+    """
+    Splits each attribute at the cut point with the most information gain or, with the MDL criterion, at as many cut
+    points as the criterion accepts
+
+    """
+
+    kind = "information_gain"
+    __mdl = False
+
+    def __init__(self, mdl=False, cut_points=None):
+        """
+        Constructor of the class
+
+        :param bool mdl: If True, splits each attribute into multiple intervals, stopping by the MDL criterion
+        :param dict cut_points: Already fitted cut points, like {<attribute>: [<cut point>, ...]}
+        """
+
+        super(InformationGainDiscretizer, self).__init__(cut_points)
+
+        self.__mdl = mdl
+        self.kind = "information_gain_mdl" if mdl else "information_gain"
+
+    def _fit_attributes(self, data_handler, attributes):
+        classes = data_handler.class_values()
+        cut_points = {}
+
+        for attr in attributes:
+            values = data_handler.attribute_values(attr)
+
+            if self.__mdl:
+                # Without any cut point accepted, every value falls in a single interval
+                cut_points[attr] = mdl_cut_points(values, classes) or [float(max(values))]
+            else:
+                cut_points[attr] = [best_threshold(values, classes)[0]]
+
+        return cut_points
+
+
+supported_discretizers = ["mean", "quartiles", "information_gain", "information_gain_mdl"]
+
+
+def make_discretizer(kind, cut_points=None):
+    """
+    :param string kind: The kind of discretizer. Options are "mean", "quartiles", "information_gain" and
+    "information_gain_mdl"
+    :param dict cut_points: Already fitted cut points, like {<attribute>: [<cut point>, ...]}
+    :return: The discretizer
+    :rtype: Discretizer
+    """
+
+    if kind == "mean":
+        return MeanDiscretizer(cut_points)
+    elif kind == "quartiles":
+        return QuartileDiscretizer(cut_points)
+    elif kind == "information_gain":
+        return InformationGainDiscretizer(False, cut_points)
+    elif kind == "information_gain_mdl":
+        return InformationGainDiscretizer(True, cut_points)
+
+    raise AttributeError("Discretization is not supported!")
+
+
+def load_discretizer(path):
+    """
+    Loads a discretizer saved by Discretizer.save
+
+    :param string path: The file to read
+    :return: The fitted discretizer
+    :rtype: Discretizer
+    """
+
+    with open(path, "r") as discretizer_file:
+        saved = json.load(discretizer_file)
+
+    return make_discretizer(saved["kind"], saved["cut_points"])
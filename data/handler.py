@@ -7,6 +7,12 @@ import random
 import math
 import copy
 
+from .columnar import np, require_numpy, read_only, to_column, encode_column, decode_values, is_numeric, \
+    normalize_column
+from .counting import ContingencyTable, first_appearance_codes
+from .thresholds import interval_label, interval_labels
+from .discretizers import MeanDiscretizer, QuartileDiscretizer, InformationGainDiscretizer
+
 logger = logging.getLogger("main")
 
 
@@ -21,16 +27,28 @@ class DataHandler(object):
     __class_attr = None
     __idx_class_attr = None
     __data_by_attr = []
-    __data_as_instances = []
-
-    def __init__(self, raw_data, class_attr, id_attr=None, normalize=False):
+    __data_as_instances = None
+    __columnar = False
+    __columns = None
+    __dictionaries = None
+    __rows = None
+    __weights = None
+
+    def __init__(self, raw_data, class_attr, id_attr=None, normalize=False, columnar=False):
         """
         Constructor of the class
 
         :param list raw_data: A list of data
         :param list class_attr: An attribute that contains important conclusion/information about the record
+        :param bool columnar: If True, stores the data as typed NumPy columns, shared as read-only views. Text columns
+        are dictionary-encoded as integer codes
         """
 
+        if columnar:
+            self.__init_columnar(raw_data, class_attr, id_attr, normalize)
+
+            return
+
         self.__data = copy.deepcopy(raw_data)
         self.__header = self.__data.pop(0)
         self.__class_attr = class_attr
@@ -80,6 +98,173 @@ class DataHandler(object):
         else:
             self.__data_by_attr = data_by_attr
 
+    def __init_columnar(self, raw_data, class_attr, id_attr, normalize):
+        require_numpy()
+
+        self.__columnar = True
+        self.__header = list(raw_data[0])
+        self.__class_attr = class_attr
+
+        raw_columns = list(zip(*raw_data[1:])) if len(raw_data) > 1 else [() for attr in self.__header]
+
+        # If present, removes id column
+        if id_attr is not None:
+            idx_id_attr = self.__header.index(id_attr)
+
+            raw_columns.pop(idx_id_attr)
+            self.__header.pop(idx_id_attr)
+
+        # Moves the class column to the end of the data
+        idx_class_attr = self.__header.index(class_attr)
+
+        raw_columns.append(raw_columns.pop(idx_class_attr))
+        self.__header.append(self.__header.pop(idx_class_attr))
+
+        self.__idx_class_attr = len(self.__header) - 1
+
+        columns = [to_column(raw_column) for raw_column in raw_columns]
+
+        if normalize:
+            columns = [normalize_column(column) for column in columns]
+
+        self.__set_columns(columns)
+
+    def __set_columns(self, columns, dictionaries=None):
+        """
+        Stores the typed columns, dictionary-encoding the text ones unless their dictionaries are given
+
+        :param list columns: The typed columns, or the codes of the encoded ones
+        :param list dictionaries: The dictionary of each column, or None for the columns not encoded
+        """
+
+        if dictionaries is None:
+            dictionaries = [None] * len(columns)
+            columns = list(columns)
+
+            for idx_attr, column in enumerate(columns):
+                if column.dtype.kind == "U":
+                    columns[idx_attr], dictionaries[idx_attr] = encode_column(column)
+
+        self.__columns = tuple(read_only(column) for column in columns)
+        self.__dictionaries = tuple(dictionaries)
+
+    @staticmethod
+    def from_columns(header, columns, class_attr, normalize=False, columnar=False, dictionaries=None):
+        """
+        Creates a DataHandler straight from its columns, without the row-wise copies of the constructor
+
+        :param list header: The attribute names, without the id attribute and with the class attribute last
+        :param list columns: One column per attribute, in the order of the header. Typed NumPy columns for the columnar
+        backend, lists of raw string values otherwise
+        :param string class_attr: The class attribute, last in the header
+        :param bool normalize: If True, normalizes the numeric attributes
+        :param bool columnar: If True, the columns are typed NumPy columns
+        :param list dictionaries: On the columnar backend, the dictionary of each column whose codes are given instead
+        of its values, or None for the other columns. By default, text columns are encoded
+        :return: The DataHandler
+        :rtype: DataHandler
+        """
+
+        if header[-1] != class_attr:
+            raise AttributeError("Header without the class attribute last is not supported!")
+
+        handler = DataHandler.__new__(DataHandler)
+
+        handler.__header = list(header)
+        handler.__class_attr = class_attr
+        handler.__idx_class_attr = len(header) - 1
+
+        if columnar:
+            require_numpy()
+
+            handler.__columnar = True
+            handler.__set_columns([normalize_column(column) if normalize else column for column in columns],
+                                  dictionaries)
+
+            return handler
+
+        handler.__data = [list(row) for row in zip(*columns)]
+
+        data_by_attr = tuple([handler.__process_raw_data_value(value) for value in column] for column in columns)
+
+        handler.__data_by_attr = handler.__normalize(data_by_attr) if normalize else data_by_attr
+
+        return handler
+
+    def __view(self, rows, weights=None):
+        """
+        Creates a subset DataHandler that shares this handler's columns, holding only the indexes of its rows
+
+        :param numpy.ndarray rows: The indexes of the subset rows, relative to the shared columns
+        :param numpy.ndarray weights: If given, the number of instances each row stands for
+        :return: The subset DataHandler
+        :rtype: DataHandler
+        """
+
+        handler = DataHandler.__new__(DataHandler)
+
+        handler.__columnar = True
+        handler.__header = self.__header
+        handler.__class_attr = self.__class_attr
+        handler.__idx_class_attr = self.__idx_class_attr
+        handler.__columns = self.__columns
+        handler.__dictionaries = self.__dictionaries
+        handler.__rows = read_only(rows)
+        handler.__weights = read_only(weights) if weights is not None else None
+
+        return handler
+
+    def __column(self, idx_attr):
+        """
+        :return: The stored column, holding the codes of a dictionary-encoded attribute. On a weighted handler, a row
+        stands for as many instances as its weight
+        :rtype: numpy.ndarray
+        """
+
+        if self.__rows is None:
+            return self.__columns[idx_attr]
+
+        return read_only(self.__columns[idx_attr][self.__rows])
+
+    def __instance_column(self, idx_attr):
+        """
+        :return: The stored column, with one item per instance
+        :rtype: numpy.ndarray
+        """
+
+        if self.__weights is None:
+            return self.__column(idx_attr)
+
+        return read_only(np.repeat(self.__column(idx_attr), self.__weights))
+
+    def __decoded(self, idx_attr):
+        """
+        :return: The column with the values of the attribute
+        :rtype: numpy.ndarray
+        """
+
+        if self.__dictionaries[idx_attr] is None:
+            return self.__instance_column(idx_attr)
+
+        return read_only(self.__dictionaries[idx_attr][self.__instance_column(idx_attr)])
+
+    def __decoded_list(self, idx_attr):
+        if self.__dictionaries[idx_attr] is None:
+            return self.__instance_column(idx_attr).tolist()
+
+        return decode_values(self.__instance_column(idx_attr), self.__dictionaries[idx_attr])
+
+    def __derive(self, raw_data):
+        """
+        Creates a new DataHandler, on the same storage backend, from a raw data list
+
+        :param list raw_data: A list of data, with the header as first item
+        :return: The new DataHandler
+        :rtype: DataHandler
+        """
+
+        return DataHandler(raw_data, self.__class_attr, columnar=self.__columnar)
+
     def __process_raw_data_value(self, record):
         value = record.strip()
 
@@ -159,7 +344,13 @@ class DataHandler(object):
     def class_attribute(self):
         return self.__class_attr
 
+    def is_columnar(self):
+        return self.__columnar
+
     def by_attributes(self):
+        if self.__columnar:
+            return tuple(self.__decoded(idx_attr) for idx_attr in range(0, len(self.__columns)))
+
         if bool(self.__data_by_attr):
             return copy.deepcopy(self.__data_by_attr)
 
@@ -172,7 +363,10 @@ class DataHandler(object):
         :rtype: list
         """
 
-        if self.__data_as_instances:
+        if self.__columnar:
+            return self.__columnar_instances()
+
+        if self.__data_as_instances is not None:
             return copy.deepcopy(self.__data_as_instances)
 
         data = self.by_attributes()
@@ -195,7 +389,129 @@ class DataHandler(object):
 
         return copy.deepcopy(self.__data_as_instances)
 
+    def __columnar_instances(self):
+        # Tuples are immutable, so the cached instances are shared and only the list holding them is copied
+        if self.__data_as_instances is None:
+            values = [self.__decoded_list(idx_attr) for idx_attr in range(0, len(self.__columns))]
+            classes = values.pop(self.__idx_class_attr)
+
+            if values:
+                self.__data_as_instances = tuple(zip(zip(*values), classes))
+            else:
+                self.__data_as_instances = tuple(((), yi) for yi in classes)
+
+        return list(self.__data_as_instances)
+
+    def attribute_values(self, attr):
+        """
+        The values of a single attribute, in instance order
+
+        :param string attr: The attribute name
+        :return: The values of the attribute
+        :rtype: list or numpy.ndarray
+        """
+
+        idx_attr = self.attributes().index(attr)
+
+        if self.__columnar:
+            return self.__decoded(idx_attr)
+
+        return list(self.__data_by_attr[idx_attr])
+
+    def distinct_values(self, attr):
+        """
+        The distinct values of a single attribute, in order of first appearance. On the columnar backend, encoded
+        attributes are deduplicated by their codes
+
+        :param string attr: The attribute name
+        :return: The distinct values
+        :rtype: list
+        """
+
+        idx_attr = self.attributes().index(attr)
+
+        if self.__columnar:
+            if len(self) == 0:
+                return []
+
+            return self.__decoded_codes(idx_attr, first_appearance_codes(self.__column(idx_attr))[0])
+
+        values = []
+
+        for value in self.__data_by_attr[idx_attr]:
+            if value not in values:
+                values.append(value)
+
+        return values
+
+    def encoded_attributes(self):
+        """
+        The attribute columns as stored, for code that works on dictionary codes. Columnar backend only
+
+        :return: A list with a tuple (<column>, <dictionary or None>) per attribute, without the class attribute
+        :rtype: list
+        """
+
+        if not self.__columnar:
+            raise AttributeError("Encoded attributes without the columnar backend is not supported!")
+
+        return [(self.__instance_column(idx_attr), self.__dictionaries[idx_attr])
+                for idx_attr in range(0, len(self.__columns)) if idx_attr != self.__idx_class_attr]
+
+    def coded_columns(self):
+        """
+        The stored rows as codes numbering the distinct values of each column in order of first appearance, for code
+        that counts over many subsets of the rows at once. Columnar backend only
+
+        :return: A tuple with a (<codes>, <values>) tuple per attribute, without the class attribute, the (<codes>,
+        <values>) tuple of the class attribute and the weight of each row, or None if the rows are not weighted
+        :rtype: tuple
+        """
+
+        if not self.__columnar:
+            raise AttributeError("Coded columns without the columnar backend is not supported!")
+
+        coded = []
+
+        for idx_attr in range(0, len(self.__columns)):
+            values, codes = first_appearance_codes(self.__column(idx_attr))
+
+            coded.append((codes, self.__decoded_codes(idx_attr, values)))
+
+        class_coded = coded.pop(self.__idx_class_attr)
+
+        return coded, class_coded, self.__weights
+
+    def class_counts(self):
+        """
+        Counts the instances of each class, keeping the classes in order of first appearance
+
+        :return: A dict like {<class>: <count>, ...}
+        :rtype: dict
+        """
+
+        if self.__columnar:
+            classes, first_idx, inverse = np.unique(self.__column(self.__idx_class_attr), return_index=True,
+                                                    return_inverse=True)
+            counts = np.bincount(inverse.reshape(-1), weights=self.__weights, minlength=len(classes)).astype(np.int64)
+            order = np.argsort(first_idx)
+
+            if self.__dictionaries[self.__idx_class_attr] is not None:
+                classes = self.__dictionaries[self.__idx_class_attr][classes]
+
+            return dict(zip(classes[order].tolist(), counts[order].tolist()))
+
+        return {yi: len(idxs) for yi, idxs in self.by_class_attr_values().items()}
+
     def by_class_attr_values(self):
+        if self.__columnar:
+            data = {}
+
+            for idx, yi in enumerate(self.__decoded_list(self.__idx_class_attr)):
+                data.setdefault(yi, []).append(idx)
+
+            return data
+
         instances = self.as_instances()
 
         data = {instance[1]: [] for instance in instances}
@@ -206,12 +522,26 @@ class DataHandler(object):
         return data
 
     def as_raw_data(self):
+        if self.__columnar:
+            columns = [self.__decoded_list(idx_attr) for idx_attr in range(0, len(self.__columns))]
+            rows = [list(row) for row in zip(*columns)]
+
+            return [list(self.__header)] + rows
+
         attributes = copy.deepcopy([self.__header])
         data = copy.deepcopy(self.__data)
 
         return list(attributes + data)
 
     def get_average_for_attr(self, attr):
+        if self.__columnar:
+            column = self.attribute_values(attr)
+
+            if not is_numeric(column):
+                raise TypeError("Attribute '" + attr + "' is not numeric")
+
+            return float(column.mean())
+
         data = self.by_attributes()
 
         average = 0
@@ -270,7 +600,7 @@ class DataHandler(object):
             samples += fold
 
         samples.insert(0, self.__header)
-        handler = DataHandler(samples, self.__class_attr)
+        handler = self.__derive(samples)
 
         return handler
 
@@ -285,39 +615,36 @@ class DataHandler(object):
 
         for i in range(len(folds)):
             folds[i].insert(0, self.__header)
-            folds_handler[i] = DataHandler(folds[i], self.__class_attr)
+            folds_handler[i] = self.__derive(folds[i])
 
         return folds_handler
 
-    def stratify(self, k_folds):
+    def stratified_indexes(self, k_folds, rng=random):
         """
-        Divide the data into k stratified folds, maintaining the main proportion
+        Divide the indexes of the instances into k stratified folds, maintaining the main proportion
 
         :param integer k_folds: Number of folds
-        :return: The folds
+        :param random.Random rng: The random generator drawing the folds. Defaults to the global one
+        :return: The folds, as lists of instance indexes
         :rtype: list
         """
 
-        random.seed(None)
-
-        data = self.as_raw_data()
+        total_instances = len(self)
         classes = self.by_class_attr_values()
 
         folds = [[] for i in range(0, k_folds)]
 
-        instances_per_fold = round(len(data) / k_folds)
+        instances_per_fold = round(total_instances / k_folds)
 
         for yi in classes:
-            yi_proportion = len(classes[yi]) / len(data)
+            yi_proportion = len(classes[yi]) / total_instances
 
             counter = round(yi_proportion * instances_per_fold)
 
             while counter > 0:
                 try:
                     for idx in range(0, k_folds):
-                        instance = data[classes[yi].pop(random.randint(0, len(classes[yi]) - 1))]
-
-                        folds[idx].append(instance)
+                        folds[idx].append(classes[yi].pop(rng.randint(0, len(classes[yi]) - 1)))
 
                     counter -= 1
 
@@ -326,6 +653,37 @@ class DataHandler(object):
 
         return folds
 
+    def stratify(self, k_folds):
+        """
+        Divide the data into k stratified folds, maintaining the main proportion
+
+        :param integer k_folds: Number of folds
+        :return: The folds
+        :rtype: list
+        """
+
+        data = self.as_raw_data()
+
+        # Remove the header, so the indexes match the ones of the instances
+        data.pop(0)
+
+        return [[data[idx] for idx in fold] for fold in self.stratified_indexes(k_folds)]
+
+    def bootstrap_indexes(self, ratio=1.0, rng=random):
+        """
+        Draws, with refilling, the indexes of a bootstrap sample of the DataHandler's data
+
+        :param ratio: Percentage of the data size tha defines the generated bootstrap size
+        :param random.Random rng: The random generator drawing the sample. Defaults to the global one
+        :return: A list containing the randomly chosen instance indexes
+        :rtype: List
+        """
+        total_instances = len(self)
+
+        bootstrap_size = round(total_instances * ratio)
+
+        return [rng.randrange(total_instances) for i in range(0, bootstrap_size)]
+
     def bootstrap(self, ratio=1.0):
         """
         Generates a list with refilling samples from the DataHandler's data
@@ -339,14 +697,103 @@ class DataHandler(object):
         # Remove the header
         data.pop(0)
 
-        bootstrap = []
-        bootstrap_size = round((len(data) - 1) * ratio)
+        return [data[index] for index in self.bootstrap_indexes(ratio)]
+
+    def subset(self, idxs):
+        """
+        Generates a new DataHandler with the instances at the given indexes, which may repeat. On the columnar backend
+        the result is a view over the same columns, otherwise it shares the already parsed values of the instances
+
+        :param list idxs: The instance indexes, relative to this DataHandler
+        :return: A DataHandler with the selected instances
+        :rtype: DataHandler
+        """
+
+        if self.__columnar:
+            idxs = np.asarray(idxs, dtype=np.intp)
+
+            if self.__weights is not None:
+                return self.__view(np.repeat(self.__rows, self.__weights)[idxs])
+
+            return self.__view(self.__rows[idxs] if self.__rows is not None else idxs)
+
+        handler = DataHandler.__new__(DataHandler)
+
+        handler.__header = list(self.__header)
+        handler.__class_attr = self.__class_attr
+        handler.__idx_class_attr = self.__idx_class_attr
+
+        # The rows are never modified in place, so they are shared instead of copied
+        handler.__data = [self.__data[idx] for idx in idxs]
+        handler.__data_by_attr = tuple([values[idx] for idx in idxs] for values in self.__data_by_attr)
+
+        return handler
+
+    def fold_split(self, folds, idx_test_fold):
+        """
+        Splits the instances into the training and the testing DataHandlers of a fold, without rebuilding them from raw
+        rows. On the columnar backend both are views over the same columns
+
+        :param list folds: The folds, as lists of instance indexes, like the ones of stratified_indexes
+        :param integer idx_test_fold: The index of the testing fold
+        :return: A tuple with the training DataHandler, made of the other folds in order, and the testing DataHandler
+        :rtype: tuple
+        """
+
+        train_idxs = [idx for idx_fold, fold in enumerate(folds) if idx_fold != idx_test_fold for idx in fold]
+
+        return self.subset(train_idxs), self.subset(folds[idx_test_fold])
+
+    def bootstrap_weights(self, ratio=1.0, rng=random):
+        """
+        Draws a bootstrap sample like bootstrap_indexes, as the number of times each instance was drawn
+
+        :param ratio: Percentage of the data size tha defines the generated bootstrap size
+        :param random.Random rng: The random generator drawing the sample. Defaults to the global one
+        :return: The multiplicity of each instance
+        :rtype: list or numpy.ndarray
+        """
+
+        idxs = self.bootstrap_indexes(ratio, rng)
+
+        if self.__columnar:
+            return np.bincount(np.asarray(idxs, dtype=np.intp), minlength=len(self))
 
-        while len(bootstrap) < bootstrap_size:
-            index = random.randrange(len(data) - 1)
-            bootstrap.append(data[index])
+        weights = [0] * len(self)
 
-        return bootstrap
+        for idx in idxs:
+            weights[idx] += 1
+
+        return weights
+
+    def weighted_subset(self, weights):
+        """
+        Generates a new DataHandler where each instance appears as many times as its weight. On the columnar backend the
+        result is a view holding each drawn row once, with its weight, so entropy and information gain come from
+        weighted counts and a bootstrap costs a single index and weight per distinct instance
+
+        :param list weights: The non negative integer weight of each instance, relative to this DataHandler
+        :return: A DataHandler with the weighted instances
+        :rtype: DataHandler
+        """
+
+        if self.__columnar:
+            weights = np.asarray(weights, dtype=np.intp)
+            positions = np.flatnonzero(weights)
+
+            if self.__weights is not None:
+                # Each instance of this handler is a repetition of one of its rows
+                instance_rows = np.repeat(np.arange(len(self.__rows)), self.__weights)
+                row_weights = np.bincount(instance_rows, weights=weights, minlength=len(self.__rows)).astype(np.intp)
+                positions = np.flatnonzero(row_weights)
+
+                return self.__view(self.__rows[positions], row_weights[positions])
+
+            rows = self.__rows[positions] if self.__rows is not None else positions
+
+            return self.__view(rows, weights[positions])
+
+        return self.subset([idx for idx, weight in enumerate(weights) for i in range(0, weight)])
 
     def bagging(self, k):
         """
@@ -359,17 +806,14 @@ class DataHandler(object):
         bootstraps = []
 
         for i in range(k):
-            raw_bootstrap = list(list([self.__header]) + self.bootstrap())
-
-            handler = DataHandler(raw_bootstrap, self.__class_attr)
-
-            bootstraps.append(handler)
+            bootstraps.append(self.weighted_subset(self.bootstrap_weights()))
 
         return bootstraps
 
     def filter_by_attr_value(self, attr, value):
         """
-        Generates a new DataHandler, with the data filtered by the attribute value
+        Generates a new DataHandler, with the data filtered by the attribute value. On the columnar backend the result
+        is a view holding only the indexes of the matching rows
 
         :param string attr: Attribute name do filter by
         :param mixed value: Value of the attribute
@@ -377,132 +821,142 @@ class DataHandler(object):
         :rtype: DataHandler
         """
 
-        raw_data = self.as_raw_data()
+        if self.__columnar:
+            rows = self.__rows if self.__rows is not None else np.arange(len(self))
 
-        data_handler = DataHandler(raw_data, self.__class_attr)
+            idx_attr = self.attributes().index(attr)
+            dictionary = self.__dictionaries[idx_attr]
 
-        by_attributes = data_handler.by_attributes()
+            if dictionary is None:
+                matches = self.__column(idx_attr) == value
+            else:
+                # Compares the codes, as the value has at most one code
+                codes = np.flatnonzero(dictionary == value)
+                matches = self.__column(idx_attr) == codes[0] if len(codes) else np.zeros(len(rows), dtype=bool)
 
-        to_remove_items = []
+            return self.__view(rows[matches], self.__weights[matches] if self.__weights is not None else None)
 
-        for idx_value, attr_value in enumerate(by_attributes[self.attributes().index(attr)]):
-            if attr_value != value:
-                # +1 to avoid conflict when dealing with the data and it's attributes names
-                to_remove_items.append(idx_value + 1)
+        raw_data = self.as_raw_data()
+        header = raw_data.pop(0)
 
-        filtered_raw_data = [item for idx_item, item in enumerate(raw_data) if idx_item not in to_remove_items]
+        filtered_raw_data = [item for item, attr_value in zip(raw_data, self.attribute_values(attr))
+                             if attr_value == value]
 
-        return DataHandler(filtered_raw_data, self.__class_attr)
+        return self.__derive([header] + filtered_raw_data)
 
-    def discretize(self):
-        by_attributes = self.by_attributes()
-        raw_data = self.as_raw_data()
+    def partition_by_attr(self, attr):
+        """
+        Splits the data by every value of an attribute at once, in a single pass instead of one filter per value. Each
+        partition keeps the instances in their order, like filter_by_attr_value
 
-        for attr in self.attributes():
-            try:
-                idx_attr = raw_data[0].index(attr)
+        :param string attr: Attribute name to split by
+        :return: A dict like {<value>: <DataHandler>, ...}, with the values in order of first appearance
+        :rtype: dict
+        """
 
-                average = float("{0:.3f}".format(self.get_average_for_attr(attr)))
+        idx_attr = self.attributes().index(attr)
 
-                for idx_value in range(1, len(raw_data)):
-                    if by_attributes[self.attributes().index(attr)][idx_value - 1] <= average:
-                        new_value = "%f<=" + str(average)
-                    else:
-                        new_value = "%f>" + str(average)
+        if self.__columnar:
+            rows = self.__rows if self.__rows is not None else np.arange(len(self))
 
-                    raw_data[idx_value][idx_attr] = new_value
+            values, codes = first_appearance_codes(self.__column(idx_attr))
 
-            except TypeError:
-                pass
+            # Sorting the rows by code, stably, leaves each partition as a contiguous run in instance order
+            order = np.argsort(codes, kind="stable")
+            bounds = np.cumsum(np.bincount(codes, minlength=len(values)))[:-1]
 
-        return DataHandler(raw_data, self.__class_attr)
+            rows = np.split(rows[order], bounds)
+            weights = np.split(self.__weights[order], bounds) if self.__weights is not None else [None] * len(rows)
 
-    def discretize_information_gain(self):
-        by_attributes = self.by_attributes()
-        raw_data = self.as_raw_data()
-        test_raw_data = self.as_raw_data()
+            return {value: self.__view(value_rows, value_weights) for value, value_rows, value_weights
+                    in zip(self.__decoded_codes(idx_attr, values), rows, weights)}
 
-        for attr in self.attributes():
-            try:
-                idx_attr = raw_data[0].index(attr)
+        idxs_by_value = {}
 
-                values = list(by_attributes[idx_attr])
+        for idx, value in enumerate(self.__data_by_attr[idx_attr]):
+            idxs_by_value.setdefault(value, []).append(idx)
 
-                values.sort()
+        return {value: self.subset(idxs) for value, idxs in idxs_by_value.items()}
 
-                for i in range(0, len(values) - 1):
-                    values[i] = (values[i] + values[i + 1] / 2)
+    def numeric_attributes(self):
+        """
+        :return: The attributes whose values are all numeric
+        :rtype: list
+        """
 
-                values = list(set(values))
+        if self.__columnar:
+            return [attr for idx_attr, attr in enumerate(self.attributes())
+                    if self.__dictionaries[idx_attr] is None and is_numeric(self.__columns[idx_attr])]
 
-                values.sort()
+        return [attr for idx_attr, attr in enumerate(self.attributes())
+                if all(isinstance(value, float) for value in self.__data_by_attr[idx_attr])]
 
-                value_most_gain = 0
-                most_gain = 0
+    def class_values(self):
+        """
+        The class of each instance, in instance order
 
-                for compare in values:
-                    compare = float("{0:.3f}".format(compare))
+        :return: The classes
+        :rtype: list or numpy.ndarray
+        """
 
-                    idx_attr = raw_data[0].index(attr)
+        if self.__columnar:
+            return self.__decoded(self.__idx_class_attr)
 
-                    for idx_value in range(1, len(raw_data)):
-                        if by_attributes[self.attributes().index(attr)][idx_value - 1] <= compare:
-                            new_value = "%f<=" + str(compare)
-                        else:
-                            new_value = "%f>" + str(compare)
+        return list(self.__data_by_attr[self.__idx_class_attr])
 
-                        test_raw_data[idx_value][idx_attr] = new_value
+    def discretize_by(self, cut_points):
+        """
+        Generates a new DataHandler with the given numeric attributes replaced by the intervals, delimited by the cut
+        points, that hold their values. On the columnar backend, each attribute is stored as the codes of its intervals,
+        with the interval labels as dictionary, so no label is built per value
 
-                    gain = DataHandler(test_raw_data, self.__class_attr).information_gain(attr)
+        :param dict cut_points: The sorted cut points of each attribute, like {<attribute>: [<cut point>, ...]}
+        :return: A DataHandler with the discretized data
+        :rtype: DataHandler
+        """
 
-                    if gain > most_gain:
-                        value_most_gain = compare
-                        most_gain = gain
+        attributes = self.attributes()
 
-                for idx_value in range(1, len(raw_data)):
-                    if by_attributes[self.attributes().index(attr)][idx_value - 1] <= value_most_gain:
-                        new_value = "%f<=" + str(value_most_gain)
-                    else:
-                        new_value = "%f>" + str(value_most_gain)
+        if self.__columnar:
+            columns = [self.__instance_column(idx_attr) for idx_attr in range(0, len(self.__columns))]
+            dictionaries = list(self.__dictionaries)
 
-                    raw_data[idx_value][idx_attr] = new_value
+            for attr in cut_points:
+                idx_attr = attributes.index(attr)
 
-            except TypeError:
-                pass
+                columns[idx_attr] = np.searchsorted(cut_points[attr], columns[idx_attr], side="left").astype(np.int32)
+                dictionaries[idx_attr] = read_only(np.array(interval_labels(cut_points[attr]), dtype=np.str_))
 
-        return DataHandler(raw_data, self.__class_attr)
+            return DataHandler.from_columns(self.__header, columns, self.__class_attr, columnar=True,
+                                            dictionaries=dictionaries)
 
-    def discretize_quartile(self):
-        by_attributes = self.by_attributes()
         raw_data = self.as_raw_data()
 
-        for attr in self.attributes():
-            try:
-                idx_attr = raw_data[0].index(attr)
+        for attr in cut_points:
+            idx_attr = attributes.index(attr)
 
-                values = list(by_attributes[idx_attr])
-                values.sort()
+            for idx_value, value in enumerate(self.__data_by_attr[idx_attr]):
+                raw_data[idx_value + 1][idx_attr] = interval_label(value, cut_points[attr])
 
-                quartiles = self.generate_quartiles(values)
+        return self.__derive(raw_data)
 
-                for idx_value in range(1, len(raw_data)):
-                    value = by_attributes[self.attributes().index(attr)][idx_value - 1]
+    def discretize(self):
+        return MeanDiscretizer().fit_transform(self)
 
-                    if value <= quartiles[0]:
-                        new_value = "%f<=" + str(quartiles[0])
-                    elif quartiles[0] < value <= quartiles[1]:
-                        new_value = str(quartiles[0]) + "<%f<=" + str(quartiles[1])
-                    elif quartiles[1] < value <= quartiles[2]:
-                        new_value = str(quartiles[1]) + "<%f<=" + str(quartiles[2])
-                    else:
-                        new_value = "%f>" + str(quartiles[2])
+    def discretize_information_gain(self, mdl=False):
+        """
+        Discretizes the numeric attributes by the cut point with the most information gain, found in a single sweep
+        over the sorted values
 
-                    raw_data[idx_value][idx_attr] = new_value
+        :param bool mdl: If True, splits each attribute into multiple intervals, stopping by the MDL criterion
+        :return: A DataHandler with the discretized data
+        :rtype: DataHandler
+        """
 
-            except TypeError:
-                pass
+        return InformationGainDiscretizer(mdl).fit_transform(self)
 
-        return DataHandler(raw_data, self.__class_attr)
+    def discretize_quartile(self):
+        return QuartileDiscretizer().fit_transform(self)
 
     def generate_quartiles(self, values):
         n = len(values)
@@ -523,53 +977,84 @@ class DataHandler(object):
 
         return q
 
-    def information_gain(self, attr):
-        by_attributes = self.by_attributes()
+    def contingency_tables(self, attributes):
+        """
+        Counts the (value x class) pairs of each attribute, sharing a single encoding of the classes
 
-        value_count = {}
-        total_values = len(by_attributes[self.attributes().index(attr)])
-        info_attr = 0
+        :param list attributes: The attributes to count
+        :return: A dict like {<attribute>: <ContingencyTable>, ...}
+        :rtype: dict
+        """
 
-        for value in by_attributes[self.attributes().index(attr)]:
-            if value in list(value_count):
-                value_count[value] += 1
-            else:
-                value_count[value] = 1
+        if self.__columnar:
+            classes, class_codes = first_appearance_codes(self.__column(self.__idx_class_attr))
+            classes = self.__decoded_codes(self.__idx_class_attr, classes)
+
+            tables = {}
+
+            for attr in attributes:
+                idx_attr = self.attributes().index(attr)
+                table = ContingencyTable.count_codes(self.__column(idx_attr), class_codes, classes, self.__weights)
+
+                tables[attr] = ContingencyTable(self.__decoded_codes(idx_attr, table.values), classes, table.counts)
 
-        for value in value_count:
-            info = self.filter_by_attr_value(attr, value).entropy()
-            info_attr += ((value_count[value] / total_values) * info)
+            return tables
 
-        logger.debug("Mean entropy for '" + attr + "': " + str(info_attr))
+        class_values = self.__data_by_attr[self.__idx_class_attr]
 
-        info = self.entropy()
+        return {attr: ContingencyTable.count(self.attribute_values(attr), class_values) for attr in attributes}
+
+    def __decoded_codes(self, idx_attr, values):
+        if self.__dictionaries[idx_attr] is None:
+            return values
+
+        return decode_values(np.array(values, dtype=np.intp), self.__dictionaries[idx_attr])
+
+    def information_gain(self, attr):
+        table = self.contingency_tables([attr])[attr]
 
-        return info - info_attr
+        logger.debug("Mean entropy for '" + attr + "': " + str(table.mean_entropy()))
+
+        return table.information_gain()
 
     def entropy(self):
-        data_by_class = self.by_class_attr_values()
+        class_counts = self.class_counts()
 
-        total_instances = len(self.as_instances())
+        total_instances = len(self)
 
         info = 0
 
-        for yi in data_by_class:
-            pi = len(data_by_class[yi]) / total_instances
+        for yi in class_counts:
+            pi = class_counts[yi] / total_instances
 
             info -= pi * math.log(pi, 2)
 
         return info
 
-    def most_occurred_class(self):
-        by_class = self.by_class_attr_values()
+    def most_occurred_class(self, rng=random):
+        """
+        :param random.Random rng: The random generator breaking ties. Defaults to the global one
+        :return: The class with the most instances
+        """
+
+        class_counts = self.class_counts()
 
-        most_occurred_class_count = max([len(value) for value in by_class.values()])
-        most_occurred_class = [k for k, value in by_class.items() if len(value) == most_occurred_class_count]
+        most_occurred_class_count = max(class_counts.values())
+        most_occurred_class = [k for k, count in class_counts.items() if count == most_occurred_class_count]
 
         try:
-            return most_occurred_class[random.randint(0, 1)]
+            return most_occurred_class[rng.randint(0, 1)]
         except IndexError:
             return most_occurred_class[0]
 
+    def __len__(self):
+        if self.__columnar:
+            if self.__weights is not None:
+                return int(self.__weights.sum())
+
+            return len(self.__rows) if self.__rows is not None else len(self.__columns[self.__idx_class_attr])
+
+        return len(self.__data)
+
     def __str__(self):
         return str(self.by_attributes())
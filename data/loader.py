@@ -0,0 +1,184 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import csv
+import itertools
+from array import array
+
+from .cache import cache_key, load_columns, save_columns
+from .columnar import np, require_numpy, read_only, encode_column
+from .handler import DataHandler
+
+
+def __is_number(value):
+    try:
+        float(value)
+
+        return True
+
+    except ValueError:
+        return False
+
+
+def __column_order(header, class_attr, id_attr):
+    """
+    :return: The indexes of the raw columns to keep, without the id attribute and with the class attribute last
+    :rtype: list
+    """
+
+    idx_class_attr = header.index(class_attr)
+    idx_id_attr = header.index(id_attr) if id_attr is not None else None
+
+    order = [idx for idx, attr in enumerate(header) if idx != idx_id_attr and attr != class_attr]
+
+    return order + [idx_class_attr]
+
+
+def __read_chunks(reader, chunk_size):
+    while True:
+        chunk = [row for row in itertools.islice(reader, chunk_size) if row]
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def __text_column(filename, delimiter, idx_raw):
+    """
+    Reads a single column of the file as text, for a column whose type was inferred as numeric from the sample but
+    that turned out to hold text later on
+
+    :rtype: numpy.ndarray
+    """
+
+    with open(filename, "r") as csv_file:
+        reader = csv.reader(csv_file, delimiter=delimiter)
+        next(reader)
+
+        return np.array([row[idx_raw].strip() for row in reader if row], dtype=np.str_)
+
+
+def __load_columnar(filename, delimiter, order, chunk_size, sample_size):
+    with open(filename, "r") as csv_file:
+        reader = csv.reader(csv_file, delimiter=delimiter)
+        next(reader)
+
+        sample = [row for row in itertools.islice(reader, sample_size) if row]
+
+        # Numeric columns are written to float buffers, the others are dictionary-encoded into code buffers
+        numeric = [all(__is_number(row[idx_raw]) for row in sample) for idx_raw in order]
+        buffers = [array("d") if is_numeric else array("i") for is_numeric in numeric]
+        dictionaries = [None if is_numeric else {} for is_numeric in numeric]
+
+        # Columns with text after the sample, to be read again as text
+        demoted = set()
+
+        for chunk in itertools.chain([sample], __read_chunks(reader, chunk_size)):
+            for idx_column, idx_raw in enumerate(order):
+                if idx_column in demoted:
+                    continue
+
+                values = [row[idx_raw] for row in chunk]
+
+                if not numeric[idx_column]:
+                    dictionary = dictionaries[idx_column]
+
+                    buffers[idx_column].extend(dictionary.setdefault(value.strip(), len(dictionary))
+                                               for value in values)
+                    continue
+
+                try:
+                    buffers[idx_column].extend(float(value) for value in values)
+
+                except ValueError:
+                    demoted.add(idx_column)
+                    buffers[idx_column] = None
+
+    columns = []
+
+    for idx_column, idx_raw in enumerate(order):
+        if idx_column in demoted:
+            column, dictionary = encode_column(__text_column(filename, delimiter, idx_raw))
+        elif numeric[idx_column]:
+            # Shares the buffer memory instead of copying it
+            column = np.frombuffer(buffers[idx_column], dtype=np.float64) if buffers[idx_column] else np.empty(0)
+            dictionary = None
+        else:
+            column = np.array(buffers[idx_column], dtype=np.int32)
+            dictionary = np.array(sorted(dictionaries[idx_column], key=dictionaries[idx_column].get), dtype=np.str_)
+
+        buffers[idx_column] = None
+        dictionaries[idx_column] = dictionary
+
+        columns.append(read_only(column))
+
+    return columns, dictionaries
+
+
+def __load_lists(filename, delimiter, order, chunk_size):
+    columns = [[] for idx_raw in order]
+
+    with open(filename, "r") as csv_file:
+        reader = csv.reader(csv_file, delimiter=delimiter)
+        next(reader)
+
+        for chunk in __read_chunks(reader, chunk_size):
+            for column, idx_raw in zip(columns, order):
+                column.extend(row[idx_raw] for row in chunk)
+
+    return columns
+
+
+def load_csv(filename, delimiter, class_attr, id_attr=None, normalize=False, columnar=False, chunk_size=4096,
+             sample_size=256, cache_dir=None):
+    """
+    Loads a CSV file into a DataHandler, streaming it in chunks of rows straight into one buffer per column, so the
+    whole file is never held as rows. The id attribute is skipped and the class attribute moved to the end while
+    reading. On the columnar backend, the type of each column is inferred from a sample of the first rows, numeric
+    columns are filled as float buffers and text columns are dictionary-encoded as they are read
+
+    :param string filename: The CSV file, with the header as first row
+    :param string delimiter: The delimiter of the values
+    :param string class_attr: The class attribute
+    :param string id_attr: If given, an attribute to remove
+    :param bool normalize: If True, normalizes the numeric attributes
+    :param bool columnar: If True, stores the data as typed NumPy columns
+    :param integer chunk_size: Number of rows read at a time
+    :param integer sample_size: Number of rows inspected to infer the type of the columns
+    :param string cache_dir: If given, a directory caching the parsed columns, keyed by the content of the file and the
+    options above. Cached data sets are memory-mapped instead of parsed. Requires the columnar backend
+    :return: The DataHandler
+    :rtype: DataHandler
+    """
+
+    if cache_dir is not None:
+        if not columnar:
+            raise AttributeError("Cache without the columnar backend is not supported!")
+
+        key = cache_key(filename, delimiter, class_attr, id_attr)
+        cached = load_columns(cache_dir, key)
+
+        if cached is not None:
+            return DataHandler.from_columns(cached[0], cached[1], class_attr, normalize, columnar, cached[2])
+
+    with open(filename, "r") as csv_file:
+        header = next(csv.reader(csv_file, delimiter=delimiter))
+
+    order = __column_order(header, class_attr, id_attr)
+    header = [header[idx_raw] for idx_raw in order]
+
+    if columnar:
+        require_numpy()
+
+        columns, dictionaries = __load_columnar(filename, delimiter, order, chunk_size, sample_size)
+
+        if cache_dir is not None:
+            save_columns(cache_dir, key, header, columns, dictionaries)
+
+        return DataHandler.from_columns(header, columns, class_attr, normalize, columnar, dictionaries)
+
+    columns = __load_lists(filename, delimiter, order, chunk_size)
+
+    return DataHandler.from_columns(header, columns, class_attr, normalize, columnar)
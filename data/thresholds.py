@@ -0,0 +1,247 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import bisect
+import math
+
+from .counting import entropy_from_counts
+
+
+def as_list(values):
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+
+def interval_label(value, cut_points):
+    """
+    Describes the interval, delimited by the sorted cut points, that contains the value
+
+    :param float value: The value to describe
+    :param list cut_points: The sorted cut points
+    :return: A label like "%f<=c0", "c0<%f<=c1" or "%f>cn"
+    :rtype: string
+    """
+
+    idx_interval = bisect.bisect_left(cut_points, value)
+
+    if idx_interval == 0:
+        return "%f<=" + str(cut_points[0])
+    elif idx_interval == len(cut_points):
+        return "%f>" + str(cut_points[-1])
+    else:
+        return str(cut_points[idx_interval - 1]) + "<%f<=" + str(cut_points[idx_interval])
+
+
+def interval_labels(cut_points):
+    """
+    Describes every interval delimited by the sorted cut points, with the labels of interval_label
+
+    :param list cut_points: The sorted cut points
+    :return: The label of each interval, in order
+    :rtype: list
+    """
+
+    inner_labels = [str(lower) + "<%f<=" + str(upper) for lower, upper in zip(cut_points, cut_points[1:])]
+
+    return ["%f<=" + str(cut_points[0])] + inner_labels + ["%f>" + str(cut_points[-1])]
+
+
+def parse_interval_label(label):
+    """
+    Parses a label generated by interval_label (or by the mean and quartile discretizations) back into its bounds
+
+    :param string label: A label like "%f<=c0", "c0<%f<=c1" or "%f>cn"
+    :return: A tuple (lower, upper) for the interval lower < x <= upper, or None if the label is not an interval
+    :rtype: tuple
+    """
+
+    if not isinstance(label, str):
+        return None
+
+    try:
+        if label.startswith("%f<="):
+            return float("-inf"), float(label[len("%f<="):])
+        elif label.startswith("%f>"):
+            return float(label[len("%f>"):]), float("inf")
+        elif "<%f<=" in label:
+            lower, upper = label.split("<%f<=")
+
+            return float(lower), float(upper)
+
+    except ValueError:
+        pass
+
+    return None
+
+
+def __sort_by_value(values, classes):
+    """
+    Sorts the instances by value, encoding the classes in order of first appearance
+
+    :return: A tuple with the sorted values, their class codes and the number of classes
+    :rtype: tuple
+    """
+
+    codes = {}
+    class_codes = []
+
+    for yi in as_list(classes):
+        if yi not in codes:
+            codes[yi] = len(codes)
+
+        class_codes.append(codes[yi])
+
+    pairs = sorted(zip(as_list(values), class_codes), key=lambda pair: pair[0])
+
+    return [pair[0] for pair in pairs], [pair[1] for pair in pairs], len(codes)
+
+
+def best_threshold(values, classes):
+    """
+    Finds the binary cut point with the most information gain, sweeping the sorted values once while the class counts
+    of each side are updated incrementally. Ties keep the smallest cut point, and (0, 0) is returned when no cut point
+    has a positive gain
+
+    :param list values: The numeric values of the attribute
+    :param list classes: The class of each instance
+    :return: A tuple with the cut point and its information gain
+    :rtype: tuple
+    :raises TypeError: If the values are not numeric
+    """
+
+    sorted_values, sorted_codes, n_classes = __sort_by_value(values, classes)
+
+    total = len(sorted_values)
+
+    if total == 0:
+        return 0, 0
+
+    # The historical candidate set: each value plus half of the next one, and the largest value
+    candidates = [sorted_values[i] + sorted_values[i + 1] / 2 for i in range(0, total - 1)] + [sorted_values[-1]]
+    candidates = sorted(set(float("{0:.3f}".format(candidate)) for candidate in candidates))
+
+    total_counts = [0] * n_classes
+
+    for code in sorted_codes:
+        total_counts[code] += 1
+
+    info = entropy_from_counts(total_counts)
+    # Partitions are weighted in the order their labels first appear in the data, as a contingency table does
+    first_value = values[0]
+
+    left_counts = [0] * n_classes
+    left_total = 0
+
+    value_most_gain = 0
+    most_gain = 0
+
+    for compare in candidates:
+        while left_total < total and sorted_values[left_total] <= compare:
+            left_counts[sorted_codes[left_total]] += 1
+            left_total += 1
+
+        right_counts = [total_count - left_count for total_count, left_count in zip(total_counts, left_counts)]
+
+        partitions = [(left_total, left_counts), (total - left_total, right_counts)]
+
+        if first_value > compare:
+            partitions.reverse()
+
+        info_attr = 0
+
+        for partition_total, partition_counts in partitions:
+            if partition_total > 0:
+                info_attr += (partition_total / total) * entropy_from_counts(partition_counts)
+
+        gain = info - info_attr
+
+        if gain > most_gain:
+            value_most_gain = compare
+            most_gain = gain
+
+    return value_most_gain, most_gain
+
+
+def mdl_cut_points(values, classes):
+    """
+    Finds multiple cut points with the recursive entropy minimization of Fayyad & Irani, splitting each interval at
+    its best midpoint for as long as the gain pays for the split under the MDL principle
+
+    :param list values: The numeric values of the attribute
+    :param list classes: The class of each instance
+    :return: The sorted cut points, possibly empty
+    :rtype: list
+    :raises TypeError: If the values are not numeric
+    """
+
+    sorted_values, sorted_codes, n_classes = __sort_by_value(values, classes)
+
+    if sorted_values and not isinstance(sorted_values[0], (int, float)):
+        raise TypeError("Cut points can only be found for numeric values")
+
+    cut_points = []
+    intervals = [(0, len(sorted_values))]
+
+    while intervals:
+        lo, hi = intervals.pop()
+        total = hi - lo
+
+        if total < 2:
+            continue
+
+        total_counts = [0] * n_classes
+
+        for code in sorted_codes[lo:hi]:
+            total_counts[code] += 1
+
+        left_counts = [0] * n_classes
+
+        best = None
+
+        for idx in range(lo, hi - 1):
+            left_counts[sorted_codes[idx]] += 1
+
+            # Only boundaries between distinct values can be cut points
+            if sorted_values[idx] == sorted_values[idx + 1]:
+                continue
+
+            left_total = idx - lo + 1
+            right_counts = [total_count - left_count for total_count, left_count in zip(total_counts, left_counts)]
+
+            left_info = entropy_from_counts(left_counts)
+            right_info = entropy_from_counts(right_counts)
+            info_attr = (left_total / total) * left_info + ((total - left_total) / total) * right_info
+
+            if best is None or info_attr < best[0]:
+                best = (info_attr, idx, list(left_counts), right_counts, left_info, right_info)
+
+        if best is None:
+            continue
+
+        info_attr, idx, best_left_counts, best_right_counts, left_info, right_info = best
+
+        info = entropy_from_counts(total_counts)
+        gain = info - info_attr
+
+        k = len([count for count in total_counts if count > 0])
+        k_left = len([count for count in best_left_counts if count > 0])
+        k_right = len([count for count in best_right_counts if count > 0])
+
+        delta = math.log(3 ** k - 2, 2) - (k * info - k_left * left_info - k_right * right_info)
+
+        if gain <= (math.log(total - 1, 2) + delta) / total:
+            continue
+
+        cut_point = (sorted_values[idx] + sorted_values[idx + 1]) / 2
+        rounded_cut_point = float("{0:.3f}".format(cut_point))
+
+        # Rounds like the other discretizations, unless that would move the cut point across a value
+        if sorted_values[idx] <= rounded_cut_point < sorted_values[idx + 1]:
+            cut_point = rounded_cut_point
+
+        cut_points.append(cut_point)
+
+        intervals.append((lo, idx + 1))
+        intervals.append((idx + 1, hi))
+
+    return sorted(cut_points)
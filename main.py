@@ -3,15 +3,19 @@
 
 from __future__ import division
 from __future__ import print_function
-import csv
 import logging
 import argparse
+import os
 import random
 
-from data.handler import DataHandler
-from ml.supervised.classes.id3_decision_tree import ID3DecisionTree
+from data.loader import load_csv
+from data.discretizers import supported_discretizers, make_discretizer, load_discretizer
+from ml.supervised.classes.id3_decision_tree import ID3DecisionTree, supported_builders
+from ml.supervised.classes.random_forest import RandomForest
 from ml.supervised.algorithms import id3_decision_tree
-from ml.supervised.evaluation import decision_tree_kcrossvalidation, random_forest_kcrossvalidation, get_statistics
+from ml.supervised.evaluation import decision_tree_kcrossvalidation, random_forest_kcrossvalidation, random_forest_oob, \
+    get_statistics
+from ml.supervised.parallel import supported_executors
 
 
 def setup_logger():
@@ -43,18 +47,36 @@ if __name__ == '__main__':
 
     supported_data_sets = ["benchmark", "diabetes", "wine", "ionosphere", "cancer"]
     supported_algorithms = ["id3_decision_tree", "id3_random_forest"]
-    supported_discretizations = ["mean", "information_gain", "quartiles"]
+    supported_discretizations = supported_discretizers
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--verbose", help="enables debugging", action="store_true")
     parser.add_argument("--data_set", type=str, help="the data set to test. Options are " + str(supported_data_sets))
     parser.add_argument("--algorithm", type=str, help="the algorithm to use. Options are " + str(supported_algorithms))
-    parser.add_argument("--seed", type=int, help="the seed to consider in random numbers generation")
+    parser.add_argument("--seed", type=int, help="the seed to consider in random numbers generation. The same seed gives the same results for any --jobs and --executor")
     parser.add_argument("--ntree", type=int, default=10, help="how many trees to generate. Defaults to 10")
+    parser.add_argument("--oob", help="estimates the random forest error out-of-bag instead of by cross validation", action="store_true")
+    parser.add_argument("--cut_points", type=str, help="a file with the cut points of the discretization, fitted and saved if it does not exist, and reused otherwise")
+    parser.add_argument("--model", type=str, help="a file to save the model trained on the whole data set to")
+    parser.add_argument("--columnar", help="stores the data as typed NumPy columns (requires numpy)", action="store_true")
+    parser.add_argument("--cache_dir", type=str, help="a directory caching the parsed data sets, to skip parsing them again (requires --columnar)")
+    parser.add_argument("--jobs", type=int, default=1, help="how many workers run the folds and train the trees, all together. Defaults to 1, use 0 for all of the CPUs")
+    parser.add_argument("--executor", type=str, default="serial", help="how to run the folds of the cross validation. Options are " + str(supported_executors))
+    parser.add_argument("--builder", type=str, default="recursive", help="how to grow the trees. Options are " + str(supported_builders) + ", the last two require --columnar. The histogram one splits the numeric attributes without discretizing them")
+    parser.add_argument("--max_depth", type=int, help="the depth at which the trees stop growing, the root being at 0")
+    parser.add_argument("--min_samples_split", type=int, default=2, help="the minimum number of instances to split a node. Defaults to 2")
+    parser.add_argument("--min_samples_leaf", type=int, default=1, help="the minimum number of instances in each child of a split. Defaults to 1")
+    parser.add_argument("--min_gain", type=float, default=0.0, help="the minimum information gain of a split. Defaults to 0, which splits on any gain")
     parser.add_argument("--discretization", type=str, default="mean", help="the method to use in discretization. Options are " + str(supported_discretizations))
 
     args = parser.parse_args()
 
+    limits = {"max_depth": args.max_depth, "min_samples_split": args.min_samples_split,
+              "min_samples_leaf": args.min_samples_leaf, "min_gain": args.min_gain}
+
+    if args.executor not in supported_executors:
+        raise AttributeError("Executor is not supported!")
+
     if args.seed is not None:
         random.seed(args.seed)
 
@@ -94,26 +116,53 @@ if __name__ == '__main__':
                 class_attr = "diagnosis"
                 id_attr = "id"
 
-            rows = list(csv.reader(open(filename, "r"), delimiter=delimiter))
-            data_handler = DataHandler(rows, class_attr, id_attr)
+            data_handler = load_csv(filename, delimiter, class_attr, id_attr, columnar=args.columnar, cache_dir=args.cache_dir)
+
+            # The histogram builder splits the numeric attributes by itself, at the thresholds of each node
+            if args.builder == "histogram":
+                cut_points = None
+
+            else:
+                print("Discretizing...")
+
+                if args.cut_points is not None and os.path.exists(args.cut_points):
+                    discretizer = load_discretizer(args.cut_points)
+
+                    if discretizer.kind != args.discretization:
+                        raise AttributeError("Cut points of another discretization are not supported!")
+
+                else:
+                    discretizer = make_discretizer(args.discretization).fit(data_handler)
 
-            print("Discretizing...")
+                    if args.cut_points is not None:
+                        discretizer.save(args.cut_points)
 
-            if args.discretization == "mean":
-                data_handler = data_handler.discretize()
-            elif args.discretization == "quartiles":
-                data_handler = data_handler.discretize_quartile()
-            elif args.discretization == "information_gain":
-                data_handler = data_handler.discretize_information_gain()
+                data_handler = discretizer.transform(data_handler)
+                cut_points = discretizer.cut_points()
 
             print("Processing...")
 
             if args.algorithm in supported_algorithms:
-                if args.algorithm == "id3_random_forest":
-                    print(get_statistics(random_forest_kcrossvalidation(data_handler, 10, args.ntree)))
+                if args.algorithm == "id3_random_forest" and args.oob:
+                    print(random_forest_oob(data_handler, args.ntree, args.jobs, args.builder, limits))
+
+                elif args.algorithm == "id3_random_forest":
+                    print(get_statistics(random_forest_kcrossvalidation(data_handler, 10, args.ntree, args.jobs, args.executor, args.builder, limits)))
 
                 elif args.algorithm == "id3_decision_tree":
-                    ID3DecisionTree(data_handler)
+                    tree = ID3DecisionTree(data_handler, builder=args.builder, **limits)
+
+                    print(tree.report())
+
+                    if args.model is not None:
+                        tree.save(args.model, cut_points)
+
+                if args.algorithm == "id3_random_forest" and args.model is not None:
+                    forest = RandomForest(data_handler, args.ntree, args.jobs, args.builder, limits)
+
+                    print(forest.report())
+
+                    forest.save(args.model, cut_points)
 
             print("See the log output is in output.log")
 
@@ -3,7 +3,14 @@
 
 from __future__ import division
 from .classes.id3_decision_tree import ID3DecisionTree
+from .classes.spatial_index import build_index, supported_indexes
+from .classes.neighbors import squared_distances, top_k, vote
+from .classes.lsh import RandomProjectionLSH
+from .classes.random_forest import RandomForest
+from data.columnar import np, require_numpy
+from data.handler import DataHandler
 import logging
+import random
 import sys
 
 logger = logging.getLogger("main")
@@ -18,17 +25,198 @@ def __knn_euclidean_distance(pa, pb):
     return distance**0.5
 
 
-def knn_classification(instances, test_instances, k):
+def __knn_vote(knn_classes):
+    """
+    Majority vote among the neighbors' classes. On ties, the class of the nearest neighbor wins
+
+    :param list knn_classes: The classes of the neighbors, nearest first
+    :return: The winner class
+    """
+
+    counters = {key: knn_classes.count(key) for key in knn_classes}
+
+    winner_counter = 0
+    winner = 0
+
+    for key in counters:
+        if counters[key] > winner_counter:
+            winner_counter = counters[key]
+            winner = key
+
+    return winner
+
+
+def __knn_indexed_classification(instances, test_instances, k, index):
+    spatial_index = build_index([instance[0] for instance in instances], index)
+
+    classified = []
+
+    for test_instance in test_instances:
+        distances_idx = [idx for distance, idx in spatial_index.query(test_instance, k)]
+
+        # As the brute force search, missing neighbors are filled with the first instance
+        if instances:
+            distances_idx += [0] * (k - len(distances_idx))
+
+        classified.append((test_instance, __knn_vote([instances[i][1] for i in distances_idx])))
+
+    return classified
+
+
+def __knn_vectorized_classification(instances, test_instances, k, chunk_size):
+    require_numpy()
+
+    train = np.array([instance[0] for instance in instances], dtype=np.float64)
+    test = np.array(test_instances, dtype=np.float64)
+
+    classes, codes = __knn_class_codes(instances)
+
+    n_neighbors = min(k, len(train))
+
+    classified = []
+
+    for test_start in range(0, len(test), chunk_size):
+        test_chunk = test[test_start:test_start + chunk_size]
+
+        best_distances = np.empty((len(test_chunk), 0))
+        best_idxs = np.empty((len(test_chunk), 0), dtype=np.intp)
+
+        for train_start in range(0, len(train), chunk_size):
+            train_chunk = train[train_start:train_start + chunk_size]
+
+            # Squared distances rank the neighbors as the distances do
+            distances = squared_distances(test_chunk, train_chunk)
+
+            idxs = np.broadcast_to(np.arange(train_start, train_start + len(train_chunk)), distances.shape)
+
+            best_distances, best_idxs = top_k(np.hstack((best_distances, distances)),
+                                              np.hstack((best_idxs, idxs)), n_neighbors)
+
+        # As the brute force search, missing neighbors are filled with the first instance
+        if n_neighbors < k:
+            best_idxs = np.hstack((best_idxs, np.zeros((len(test_chunk), k - n_neighbors), dtype=np.intp)))
+
+        for idx, winner in enumerate(vote(codes[best_idxs], len(classes))):
+            classified.append((test_instances[test_start + idx], classes[winner]))
+
+    return classified
+
+
+def __knn_class_codes(instances):
+    classes = []
+    class_codes = {}
+
+    for instance in instances:
+        if instance[1] not in class_codes:
+            class_codes[instance[1]] = len(classes)
+            classes.append(instance[1])
+
+    return classes, np.array([class_codes[instance[1]] for instance in instances], dtype=np.intp)
+
+
+def __knn_approximate_neighbors(instances, test_instances, k, n_tables, n_bits):
+    """
+    :return: A tuple with the neighbor indexes of each test instance, padded as the brute force search does, and the
+    number of candidates ranked for each of them
+    :rtype: tuple
+    """
+
+    lsh = RandomProjectionLSH([instance[0] for instance in instances], n_tables, n_bits, random.randrange(2 ** 31))
+
+    n_neighbors = min(k, len(instances))
+
+    neighbors, candidate_counts = lsh.query(test_instances, n_neighbors)
+
+    # As the brute force search, missing neighbors are filled with the first instance
+    if n_neighbors < k:
+        neighbors = np.hstack((neighbors, np.zeros((len(test_instances), k - n_neighbors), dtype=np.intp)))
+
+    return neighbors, candidate_counts
+
+
+def __knn_approximate_classification(instances, test_instances, k, n_tables, n_bits):
+    classes, codes = __knn_class_codes(instances)
+
+    neighbors = __knn_approximate_neighbors(instances, test_instances, k, n_tables, n_bits)[0]
+
+    return [(test_instance, classes[winner]) for test_instance, winner
+            in zip(test_instances, vote(codes[neighbors], len(classes)))]
+
+
+def knn_approximation_report(instances, test_instances, k, n_tables=8, n_bits=None, sample_size=100):
+    """
+    Measures, on a random sample of the test instances, how the approximate ("lsh") kNN compares with the exact one,
+    to choose its settings knowing their accuracy cost
+
+    :param list instances: A list of tuples like [((<attributes>), <classification>), ...]
+    :param list test_instances: The testing instances, composed of a list of attribute tuples like [(<attributes>), ...]
+    :param integer k: The k factor for the algorithm
+    :param integer n_tables: Number of hash tables of the approximate index
+    :param integer n_bits: Number of hyperplanes of each hash of the approximate index
+    :param integer sample_size: Number of test instances to compare
+    :return: The fraction of the sample with the same vote ("agreement"), the mean fraction of the exact neighbors
+    found ("recall"), the mean fraction of the instances ranked per query ("candidates") and the sample size
+    :rtype: dict
+    """
+
+    sample = random.sample(list(test_instances), min(sample_size, len(test_instances)))
+
+    if not sample or not instances:
+        return {"agreement": 1.0, "recall": 1.0, "candidates": 0.0, "sample": len(sample)}
+
+    classes, codes = __knn_class_codes(instances)
+
+    train = np.array([instance[0] for instance in instances], dtype=np.float64)
+    n_neighbors = min(k, len(instances))
+
+    exact_neighbors = top_k(squared_distances(np.array(sample, dtype=np.float64), train),
+                            np.broadcast_to(np.arange(len(train)), (len(sample), len(train))), n_neighbors)[1]
+    approximate_neighbors, candidate_counts = __knn_approximate_neighbors(instances, sample, k, n_tables, n_bits)
+
+    if n_neighbors < k:
+        exact_neighbors = np.hstack((exact_neighbors, np.zeros((len(sample), k - n_neighbors), dtype=np.intp)))
+
+    exact_votes = vote(codes[exact_neighbors], len(classes))
+    approximate_votes = vote(codes[approximate_neighbors], len(classes))
+
+    found = [len(set(exact.tolist()) & set(approximate.tolist())) / len(set(exact.tolist()))
+             for exact, approximate in zip(exact_neighbors, approximate_neighbors)]
+
+    return {"agreement": float(np.mean(exact_votes == approximate_votes)),
+            "recall": sum(found) / len(found),
+            "candidates": float(np.mean(candidate_counts)) / len(instances),
+            "sample": len(sample)}
+
+
+def knn_classification(instances, test_instances, k, algorithm="brute", chunk_size=1024, n_tables=8, n_bits=None):
     """
     Calculates the k nearest neighbor's and predicts the class of the new test_instances (tries)
 
     :param list instances: A list of tuples like [((<attributes>), <classification>), ...]
     :param list test_instances: The testing instances, composed of a list of attribute tuples like [(<attributes>), ...]
     :param integer k: The k factor for the algorithm
+    :param string algorithm: How to search the neighbors. Options are "brute", "vectorized" (brute force over blocks
+    of NumPy distances), "lsh" (approximate, with random projections) or, to build a spatial index of the instances
+    once and query it, "kd_tree", "ball_tree" and "auto"
+    :param integer chunk_size: For the "vectorized" algorithm, the number of test and of training instances in each
+    block of distances, which bounds the memory used
+    :param integer n_tables: For the approximate "lsh" algorithm, the number of hash tables. More tables find more of
+    the true neighbors, at the cost of ranking more candidates. See knn_approximation_report
+    :param integer n_bits: For the approximate "lsh" algorithm, the number of hyperplanes of each hash. More bits
+    give smaller buckets, so less candidates
     :return: A list with the classification related to the test instances
     :rtype: list
     """
 
+    if algorithm in supported_indexes:
+        return __knn_indexed_classification(instances, test_instances, k, algorithm)
+
+    if algorithm == "vectorized":
+        return __knn_vectorized_classification(instances, test_instances, k, chunk_size)
+
+    if algorithm == "lsh":
+        return __knn_approximate_classification(instances, test_instances, k, n_tables, n_bits)
+
     classified = []
 
     for test_instance in test_instances:
@@ -49,55 +237,57 @@ def knn_classification(instances, test_instances, k):
 
         knn_classes = [instances[i][1] for i in distances_idx[0:k]]
 
-        counters = {key: knn_classes.count(key) for key in knn_classes}
-
-        winner_counter = 0
-        winner = 0
-
-        for key in counters:
-            if counters[key] > winner_counter:
-                winner_counter = counters[key]
-                winner = key
-
-        classified.append((test_instance, winner))
+        classified.append((test_instance, __knn_vote(knn_classes)))
 
     return classified
 
 
-def id3_decision_tree(data_handler, test_instances):
-    classified = []
-
-    tree = ID3DecisionTree(data_handler)
-
-    for test_instance in test_instances:
-        classified.append((test_instance, tree.classify(test_instance)))
+def __tree_classification(model, test_instances):
+    """
+    Classifies the test instances with a tree model. Instances of a columnar DataHandler are routed by the codes of
+    their dictionary-encoded attributes
 
-    return classified
+    :param model: An ID3DecisionTree or a RandomForest
+    :param test_instances: A list of attribute tuples, or a DataHandler
+    :return: A list of (<attributes>, <classification>) tuples
+    :rtype: list
+    """
 
+    if isinstance(test_instances, DataHandler):
+        attributes = [instance[0] for instance in test_instances.as_instances()]
 
-def id3_random_forest(data_handler, test_instances, k):
-    trees = []
-    classified = []
+        if test_instances.is_columnar():
+            return list(zip(attributes, model.classify_encoded(test_instances.encoded_attributes())))
 
-    bag = data_handler.bagging(k)
+        test_instances = attributes
 
-    for bootstrap in bag:
-        trees.append(ID3DecisionTree(bootstrap))
+    return list(zip(test_instances, model.classify_many(test_instances)))
 
-    for test_instance in test_instances:
-        classifications = []
 
-        for tree in trees:
-            logger.debug("Testing: " + str(test_instance))
-            tree_classification = tree.classify(test_instance)
-            logger.debug("Classified (by one of the trees) as " + str(tree_classification))
+def id3_decision_tree(data_handler, test_instances, builder="recursive", limits=None, rng=None):
+    tree = ID3DecisionTree(data_handler, builder=builder, rng=rng, **(limits or {}))
 
-            classifications.append(tree_classification)
+    return __tree_classification(tree, test_instances)
 
-        counter = {tree_classification: classifications.count(tree_classification) for tree_classification in classifications}
 
-        ensemble_result = max(counter, key=lambda key: counter[key])
+def id3_random_forest(data_handler, test_instances, k, n_jobs=1, builder="recursive", limits=None, rng=random):
+    """
+    Trains a forest of k ID3 trees over bootstraps of the data and classifies the test instances by majority vote
+
+    :param DataHandler data_handler: The training data
+    :param list test_instances: The testing instances, composed of a list of attribute tuples like
+    [(<attributes>), ...], or a DataHandler
+    :param integer k: Number of trees
+    :param integer n_jobs: Number of processes training the trees, or a value below 1 to use all of the CPUs
+    :param string builder: How to grow the trees. Options are "recursive", "level_wise" and "histogram" (the last two
+    require the columnar backend)
+    :param dict limits: The growth limits of the trees ("max_depth", "min_samples_split", "min_samples_leaf" and
+    "min_gain"), as keyword arguments of ID3DecisionTree
+    :param random.Random rng: The random generator drawing the seeds of the trees. Defaults to the global one
+    :return: A list with the classification related to the test instances
+    :rtype: list
+    """
 
-        classified.append((test_instance, ensemble_result))
+    forest = RandomForest(data_handler, k, n_jobs, builder, limits, rng)
 
-    return classified
+    return __tree_classification(forest, test_instances)
@@ -0,0 +1,414 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from array import array
+import bisect
+
+from data.columnar import np
+
+
+def instances_as_columns(instances):
+    """
+    Transposes a list of instances (or a 2-D array) into columns. With NumPy available, columns made only of floats
+    become float64 arrays, so they can be routed with vectorized searches over the compiled cut points
+
+    :param list instances: A list of attribute tuples, or a 2-D array with one instance per row
+    :return: A list of columns
+    :rtype: list
+    """
+
+    columns = list(zip(*instances))
+
+    if np is None:
+        return columns
+
+    return [np.array(column, dtype=np.float64) if all(isinstance(value, float) for value in column) else column
+            for column in columns]
+
+
+def instances_indexes(instances):
+    return np.arange(len(instances)) if np is not None else list(range(0, len(instances)))
+
+
+class FlatTree(object):
+    """
+    A compact, read-only decision tree, with the nodes stored as parallel arrays in breadth-first order, so the
+    children of a node are contiguous
+
+    """
+
+    # The names and typecodes of the arrays, in the order of as_arrays
+    array_names = ["features", "first_child", "child_counts", "edge_codes", "leaf_classes", "first_cut", "cut_counts",
+                   "first_slot", "cut_points", "slot_children"]
+    array_typecodes = ["i", "i", "i", "i", "i", "i", "i", "i", "d", "i"]
+
+    # Per node
+    __features = None
+    __first_child = None
+    __child_counts = None
+    __edge_codes = None
+    __leaf_classes = None
+    __first_cut = None
+    __cut_counts = None
+    __first_slot = None
+
+    # Pools, indexed by the per node offsets
+    __cut_points = None
+    __slot_children = None
+
+    # Value tables
+    __attributes = None
+    __values = None
+    __value_codes = None
+    __classes = None
+
+    def __init__(self, root):
+        """
+        Constructor of the class, converting a tree of dict nodes, as generated by ID3DecisionTree
+
+        :param dict root: The root node, like {"attr": (<index>, <name>) or None, "value": <branches or class>, ...}
+        """
+
+        self.__features = array("i")
+        self.__first_child = array("i")
+        self.__child_counts = array("i")
+        self.__edge_codes = array("i")
+        self.__leaf_classes = array("i")
+        self.__first_cut = array("i")
+        self.__cut_counts = array("i")
+        self.__first_slot = array("i")
+        self.__cut_points = array("d")
+        self.__slot_children = array("i")
+
+        self.__attributes = {}
+        self.__values = []
+        self.__value_codes = {}
+        self.__classes = []
+
+        class_codes = {}
+
+        queue = [(root, -1)]
+
+        for idx_node, (node, edge_code) in enumerate(queue):
+            self.__edge_codes.append(edge_code)
+
+            if node["attr"] is None:
+                if node["value"] not in class_codes:
+                    class_codes[node["value"]] = len(self.__classes)
+                    self.__classes.append(node["value"])
+
+                self.__features.append(-1)
+                self.__leaf_classes.append(class_codes[node["value"]])
+                self.__first_child.append(-1)
+                self.__child_counts.append(0)
+                self.__first_cut.append(-1)
+                self.__cut_counts.append(-1)
+                self.__first_slot.append(-1)
+
+                continue
+
+            self.__attributes[node["attr"][0]] = node["attr"][1]
+
+            self.__features.append(node["attr"][0])
+            self.__leaf_classes.append(-1)
+            self.__first_child.append(len(queue))
+            self.__child_counts.append(len(node["value"]))
+
+            children = {}
+
+            for value in node["value"]:
+                if value not in self.__value_codes:
+                    self.__value_codes[value] = len(self.__values)
+                    self.__values.append(value)
+
+                children[value] = len(queue)
+                queue.append((node["value"][value], self.__value_codes[value]))
+
+            split = node.get("split")
+
+            if split is None:
+                self.__first_cut.append(-1)
+                self.__cut_counts.append(-1)
+                self.__first_slot.append(-1)
+            else:
+                self.__first_cut.append(len(self.__cut_points))
+                self.__cut_counts.append(len(split["cut_points"]))
+                self.__first_slot.append(len(self.__slot_children))
+
+                self.__cut_points.extend(split["cut_points"])
+                self.__slot_children.extend([-1 if branch is None else children[branch]
+                                             for branch in split["branches"]])
+
+    @staticmethod
+    def from_arrays(arrays, tables):
+        """
+        Rebuilds a tree from the arrays and tables of FlatTree.as_arrays and FlatTree.tables. The arrays are kept as
+        given, so they may be read-only views over a memory-mapped file
+
+        :param list arrays: The node arrays and pools, in the order of FlatTree.array_names
+        :param dict tables: The value tables, like {"attributes": [[<index>, <name>], ...], "values": [...], ...}
+        :return: The tree
+        :rtype: FlatTree
+        """
+
+        tree = FlatTree.__new__(FlatTree)
+
+        (tree.__features, tree.__first_child, tree.__child_counts, tree.__edge_codes, tree.__leaf_classes,
+         tree.__first_cut, tree.__cut_counts, tree.__first_slot, tree.__cut_points, tree.__slot_children) = arrays
+
+        tree.__attributes = {idx_attr: attr for idx_attr, attr in tables["attributes"]}
+        tree.__values = list(tables["values"])
+        tree.__value_codes = {value: code for code, value in enumerate(tree.__values)}
+        tree.__classes = list(tables["classes"])
+
+        return tree
+
+    def as_arrays(self):
+        """
+        :return: The node arrays and pools, in the order of FlatTree.array_names
+        :rtype: list
+        """
+
+        return [self.__features, self.__first_child, self.__child_counts, self.__edge_codes, self.__leaf_classes,
+                self.__first_cut, self.__cut_counts, self.__first_slot, self.__cut_points, self.__slot_children]
+
+    def tables(self):
+        """
+        :return: The value tables, like {"attributes": [[<index>, <name>], ...], "values": [...], "classes": [...]}
+        :rtype: dict
+        """
+
+        return {"attributes": sorted([idx_attr, attr] for idx_attr, attr in self.__attributes.items()),
+                "values": list(self.__values), "classes": list(self.__classes)}
+
+    def cut_points(self):
+        """
+        :return: The cut points each attribute is split by, anywhere in the tree, like {<name>: [<cut point>, ...]}
+        :rtype: dict
+        """
+
+        cut_points = {}
+
+        for idx_node in range(0, len(self)):
+            if self.__features[idx_node] >= 0 and self.__cut_counts[idx_node] >= 0:
+                first_cut = self.__first_cut[idx_node]
+
+                cut_points.setdefault(self.__attributes[self.__features[idx_node]], set()).update(
+                    self.__cut_points[first_cut:first_cut + self.__cut_counts[idx_node]])
+
+        return {attr: sorted(cut_points[attr]) for attr in cut_points}
+
+    def __len__(self):
+        return len(self.__features)
+
+    def report(self):
+        """
+        Measures the size of the tree, which drives the memory it takes and the time to classify with it
+
+        :return: The number of "nodes" and of "leaves", the "depth" of the deepest leaf (the root being at 0) and the
+        "mean_depth" of the leaves
+        :rtype: dict
+        """
+
+        depths = [0] * len(self.__features)
+        leaf_depths = []
+
+        # Nodes are stored breadth-first, so each parent comes before its children
+        for idx_node in range(0, len(self.__features)):
+            if self.__features[idx_node] < 0:
+                leaf_depths.append(depths[idx_node])
+                continue
+
+            first_child = self.__first_child[idx_node]
+
+            for idx_child in range(first_child, first_child + self.__child_counts[idx_node]):
+                depths[idx_child] = depths[idx_node] + 1
+
+        return {"nodes": len(self.__features), "leaves": len(leaf_depths), "depth": max(leaf_depths or [0]),
+                "mean_depth": sum(leaf_depths) / max(len(leaf_depths), 1)}
+
+    def __follow(self, idx_node, value):
+        first_child = self.__first_child[idx_node]
+        child_count = self.__child_counts[idx_node]
+
+        child = -1
+
+        if isinstance(value, float) and self.__cut_counts[idx_node] >= 0:
+            first_cut = self.__first_cut[idx_node]
+            idx_cut = bisect.bisect_left(self.__cut_points, value, first_cut, first_cut + self.__cut_counts[idx_node])
+
+            child = self.__slot_children[self.__first_slot[idx_node] + idx_cut - first_cut]
+
+        else:
+            code = self.__value_codes.get(value, -1)
+
+            if code >= 0:
+                for idx_child in range(first_child, first_child + child_count):
+                    if self.__edge_codes[idx_child] == code:
+                        child = idx_child
+                        break
+
+        # In case of no value match, force a change
+        if child < 0:
+            child = first_child + child_count - 1
+
+        return child
+
+    def classify(self, test_instance):
+        idx_node = 0
+
+        while self.__features[idx_node] >= 0:
+            idx_node = self.__follow(idx_node, test_instance[self.__features[idx_node]])
+
+        return self.__classes[self.__leaf_classes[idx_node]]
+
+    def __partition(self, idx_node, column, idxs, coded=False):
+        """
+        Distributes the indexes of the instances that reached a node among its children
+
+        :param bool coded: If True, the column holds value codes of the tree, or -1 for unknown values
+        :return: A dict like {<child>: <indexes>, ...}
+        :rtype: dict
+        """
+
+        partitions = {}
+
+        if coded:
+            first_child = self.__first_child[idx_node]
+            codes = column[idxs]
+
+            # In case of no value match, force a change
+            children = np.full(len(idxs), first_child + self.__child_counts[idx_node] - 1)
+
+            for idx_child in range(first_child, first_child + self.__child_counts[idx_node]):
+                children[codes == self.__edge_codes[idx_child]] = idx_child
+
+            for child in np.unique(children).tolist():
+                partitions[child] = idxs[children == child]
+
+            return partitions
+
+        if self.__cut_counts[idx_node] >= 0 and np is not None and isinstance(column, np.ndarray):
+            first_cut = self.__first_cut[idx_node]
+            cut_count = self.__cut_counts[idx_node]
+            last_child = self.__first_child[idx_node] + self.__child_counts[idx_node] - 1
+
+            slots = np.searchsorted(self.__cut_points[first_cut:first_cut + cut_count], column[idxs], side="left")
+
+            for idx_slot in range(0, cut_count + 1):
+                slot_idxs = idxs[slots == idx_slot]
+
+                if len(slot_idxs) > 0:
+                    child = self.__slot_children[self.__first_slot[idx_node] + idx_slot]
+
+                    # In case of no value match, force a change
+                    child = last_child if child < 0 else child
+
+                    if child in partitions:
+                        slot_idxs = np.concatenate((partitions[child], slot_idxs))
+
+                    partitions[child] = slot_idxs
+
+            return partitions
+
+        for idx in idxs:
+            partitions.setdefault(self.__follow(idx_node, column[idx]), []).append(idx)
+
+        return partitions
+
+    def classify_many(self, instances):
+        """
+        Classifies many instances at once, routing them down the tree together
+
+        :param list instances: A list of attribute tuples, or a 2-D array with one instance per row
+        :return: The classification of each instance, in order
+        :rtype: list
+        """
+
+        if len(instances) == 0:
+            return []
+
+        return self.__route(instances_as_columns(instances), instances_indexes(instances), set())
+
+    def classify_encoded(self, encoded):
+        """
+        Classifies many instances given as columns, some of them dictionary-encoded. The dictionary of each encoded
+        column is translated once into the value codes of the tree, so its instances are routed by integer codes
+
+        :param list encoded: A list with a tuple (<column>, <dictionary or None>) per attribute, as given by
+        DataHandler.encoded_attributes
+        :return: The classification of each instance, in order
+        :rtype: list
+        """
+
+        columns = []
+        coded = set()
+
+        for idx_attr, (column, dictionary) in enumerate(encoded):
+            if dictionary is None:
+                columns.append(column)
+            else:
+                translation = np.array([self.__value_codes.get(label, -1) for label in dictionary.tolist()],
+                                       dtype=np.intp)
+
+                columns.append(translation[column])
+                coded.add(idx_attr)
+
+        n_instances = len(encoded[0][0]) if encoded else 0
+
+        return self.__route(columns, np.arange(n_instances), coded)
+
+    def __route(self, columns, idxs, coded):
+        """
+        Routes the instances down the tree together
+
+        :param list columns: The columns of the instances
+        :param idxs: The indexes of the instances
+        :param set coded: The indexes of the columns holding value codes of the tree
+        :return: The classification of each instance, in order
+        :rtype: list
+        """
+
+        classified = [None] * len(idxs)
+
+        if len(idxs) == 0:
+            return classified
+
+        pending = [(0, idxs)]
+
+        while pending:
+            idx_node, idxs = pending.pop()
+
+            if self.__features[idx_node] < 0:
+                for idx in idxs:
+                    classified[idx] = self.__classes[self.__leaf_classes[idx_node]]
+
+                continue
+
+            feature = self.__features[idx_node]
+            partitions = self.__partition(idx_node, columns[feature], idxs, feature in coded)
+
+            for child in partitions:
+                pending.append((child, partitions[child]))
+
+        return classified
+
+    def __tree_as_string(self, idx_node, level):
+        if self.__features[idx_node] < 0:
+            return ("|\t" * level) + "|Class: " + str(self.__classes[self.__leaf_classes[idx_node]]) + "\n"
+
+        else:
+            feature = self.__features[idx_node]
+            text = ("|\t" * level) + "|Attr: " + str((feature, self.__attributes[feature])) + "\n"
+
+            first_child = self.__first_child[idx_node]
+
+            for idx_child in range(first_child, first_child + self.__child_counts[idx_node]):
+                text += ("|\t" * (level + 1)) + "|Value: " + str(self.__values[self.__edge_codes[idx_child]]) + "\n"
+                text += self.__tree_as_string(idx_child, (level + 2))
+
+            return text
+
+    def __str__(self):
+        return self.__tree_as_string(0, 0).strip()
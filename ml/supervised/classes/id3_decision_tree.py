@@ -2,42 +2,125 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import division
+import bisect
 import logging
 import math
 import random
 
+from data.columnar import np
+from data.thresholds import parse_interval_label
+from .flat_tree import FlatTree, instances_as_columns, instances_indexes
+from .model_file import save_trees, load_trees
+from .level_wise import build_level_wise, build_histogram_level_wise
+
 logger = logging.getLogger("main")
 
+supported_builders = ["recursive", "level_wise", "histogram"]
+
 
 class ID3DecisionTree(object):
 
     __dt = None
+    __attributes = []
+    __class_attr = None
+    __max_depth = None
+    __min_samples_split = 2
+    __min_samples_leaf = 1
+    __min_gain = 0.0
+    __rng = random
+
+    def __init__(self, data_handler, builder="recursive", max_bins=255, max_depth=None, min_samples_split=2,
+                 min_samples_leaf=1, min_gain=0.0, rng=None):
+        """
+        Constructor of the class
+
+        :param DataHandler data_handler: The training data
+        :param string builder: How to grow the tree. Options are "recursive" (depth-first, a DataHandler per node),
+        "level_wise" (breadth-first, counting all the nodes of a level in one pass) and "histogram" (as "level_wise",
+        with binary splits of the numeric attributes at per node thresholds, so they need no discretization). The last
+        two require the columnar backend
+        :param integer max_bins: For the "histogram" builder, maximum number of bins of each numeric attribute, up to
+        256
+        :param integer max_depth: If given, the nodes at this depth (the root being at 0) become leaves
+        :param integer min_samples_split: Nodes with less instances become leaves
+        :param integer min_samples_leaf: Splits leaving a child with less instances are not considered
+        :param float min_gain: If greater than 0, nodes whose best split has a lower information gain become leaves
+        :param random.Random rng: The random generator sampling the candidate attributes and breaking ties between
+        majority classes. Defaults to the global one
+        """
 
-    def __init__(self, data_handler):
         logger.info("Generating tree...")
 
-        self.__dt = self.__generate(data_handler, data_handler.attributes())
+        self.__attributes = data_handler.attributes()
+        self.__class_attr = data_handler.class_attribute()
+
+        self.__max_depth = max_depth
+        self.__min_samples_split = min_samples_split
+        self.__min_samples_leaf = min_samples_leaf
+        self.__min_gain = min_gain
+        self.__rng = rng if rng is not None else random
+
+        limits = {"max_depth": max_depth, "min_samples_split": min_samples_split,
+                  "min_samples_leaf": min_samples_leaf, "min_gain": min_gain}
+
+        if builder == "recursive":
+            self.__dt = self.__generate(data_handler, data_handler.attributes())
+
+        elif builder == "level_wise":
+            self.__dt = build_level_wise(data_handler, self.__select_attributes, rng=self.__rng, **limits)
+
+            self.__compile_splits(self.__dt)
+
+        elif builder == "histogram":
+            self.__dt = build_histogram_level_wise(data_handler, self.__select_attributes, max_bins, rng=self.__rng,
+                                                   **limits)
+
+            self.__compile_splits(self.__dt)
+
+        else:
+            raise AttributeError("Builder is not supported!")
 
         logger.info("Generated tree: \n" + str(self))
+        logger.info("Tree report: " + str(self.report()))
+
+    def __generate(self, data_handler, attributes, depth=0, class_counts=None):
+        """
+        Builds the node for the given data and, recursively, its subtree
+
+        :param DataHandler data_handler: The data that reaches the node
+        :param list attributes: The attributes still available to split by
+        :param integer depth: The depth of the node, the root being at 0
+        :param dict class_counts: The class counts of the data, if already known from the parent's split
+        :return: The node
+        :rtype: dict
+        """
 
-    def __generate(self, data_handler, attributes):
         node = {"attr": None, "value": {}}
 
-        by_class = data_handler.by_class_attr_values()
-        classes = list(by_class.keys())
+        if class_counts is None:
+            class_counts = data_handler.class_counts()
+
+        classes = list(class_counts)
 
         if len(classes) == 1:
             node["value"] = classes[0]
 
             return node
 
-        if len(attributes) == 0:
-            node["value"] = data_handler.most_occurred_class()
+        if len(attributes) == 0 or self.__stops(depth, sum(class_counts.values())):
+            node["value"] = data_handler.most_occurred_class(self.__rng)
 
             return node
 
         else:
-            idx_most_informative_attr = self.__get_most_informative_attr(data_handler, self.__select_attributes(attributes))
+            idx_most_informative_attr, table = self.__get_most_informative_attr(data_handler,
+                                                                                self.__select_attributes(attributes))
+
+            if idx_most_informative_attr is None:
+                node["value"] = data_handler.most_occurred_class(self.__rng)
+
+                return node
+
             most_informative_attr = data_handler.attributes()[idx_most_informative_attr]
 
             logger.debug("Chosen attr: " + most_informative_attr)
@@ -50,45 +133,141 @@ class ID3DecisionTree(object):
                 # Quando o ganho é 0
                 most_informative_attr = attributes[0]
                 attributes = []
+                table = None
 
-            by_attributes = data_handler.by_attributes()
-
-            values = []
+            split = self.__split(data_handler, most_informative_attr, table)
 
-            for value in by_attributes[idx_most_informative_attr]:
-                if value not in values:
-                    values.append(value)
-
-            for value in values:
+            for value in data_handler.distinct_values(data_handler.attributes()[idx_most_informative_attr]):
                 logger.debug("Analysing " + most_informative_attr + ": value: " + str(value))
 
-                sub_data_handler = data_handler.filter_by_attr_value(most_informative_attr, value)
+                sub_data_handler = split["partitions"].get(value)
 
-                if len(sub_data_handler.as_instances()) == 0:
+                if sub_data_handler is None:
                     node["attr"] = None
-                    node["value"] = data_handler.most_occurred_class()
+                    node["value"] = data_handler.most_occurred_class(self.__rng)
 
                     return node
 
-                node["value"][value] = self.__generate(sub_data_handler, attributes)
+                node["value"][value] = self.__generate(sub_data_handler, attributes, depth + 1,
+                                                       split["class_counts"][value])
+
+            node["split"] = self.__compile_split(list(node["value"]))
 
             return node
 
+    def __compile_splits(self, node):
+        pending = [node]
+
+        while pending:
+            node = pending.pop()
+
+            if node["attr"] is not None:
+                node["split"] = self.__compile_split(list(node["value"]))
+
+                pending.extend(node["value"].values())
+
+    def __compile_split(self, values):
+        """
+        Parses the interval labels of a node's branches into sorted cut points, so numeric values are routed with a
+        bisect instead of evaluating each label
+
+        :param list values: The branch values, in the order they are tested
+        :return: A dict with the "cut_points" and, for each interval between them, the branch it leads to (or None), or
+        None if some branch is not an interval
+        :rtype: dict
+        """
+
+        intervals = [parse_interval_label(value) for value in values]
+
+        if not intervals or None in intervals:
+            return None
+
+        cut_points = sorted(set(bound for interval in intervals for bound in interval if not math.isinf(bound)))
+        bounds = [float("-inf")] + cut_points + [float("inf")]
+
+        branches = []
+
+        for idx_slot in range(0, len(cut_points) + 1):
+            branch = None
+
+            # The first branch whose interval covers the whole slot, as tested in order by the original labels
+            for value, (lower, upper) in zip(values, intervals):
+                if lower <= bounds[idx_slot] and bounds[idx_slot + 1] <= upper:
+                    branch = value
+                    break
+
+            branches.append(branch)
+
+        return {"cut_points": cut_points, "branches": branches}
+
+    def __split(self, data_handler, attr, table):
+        """
+        Splits the data of a node by the chosen attribute, taking the class counts of each value from the contingency
+        table that scored it, so the children don't count them again
+
+        :param DataHandler data_handler: The data that reaches the node
+        :param string attr: The chosen attribute
+        :param ContingencyTable table: The contingency table of the attribute over the node's data, if already built
+        :return: A dict with the "partitions" and "class_counts" of each value
+        :rtype: dict
+        """
+
+        if table is None:
+            table = data_handler.contingency_tables([attr])[attr]
+
+        class_counts = {value: {yi: count for yi, count in zip(table.classes, row) if count > 0}
+                        for value, row in zip(table.values, table.counts)}
+
+        return {"partitions": data_handler.partition_by_attr(attr), "class_counts": class_counts}
+
+    def __stops(self, depth, total_instances):
+        """
+        :return: True if the growth limits turn a node into a leaf before looking for a split
+        :rtype: bool
+        """
+
+        if self.__max_depth is not None and depth >= self.__max_depth:
+            return True
+
+        return total_instances < self.__min_samples_split
+
     def __get_most_informative_attr(self, data_handler, attributes):
-        info_gain_by_attribute = [0 for i in range(0, len(data_handler.attributes()))]
+        """
+        :return: A tuple with the index of the attribute with the most information gain and its contingency table (None
+        if it was not a candidate), or (None, None) if the growth limits leave no attribute to split by
+        :rtype: tuple
+        """
+
+        all_attributes = data_handler.attributes()
+        info_gain_by_attribute = [0 for i in range(0, len(all_attributes))]
+
+        # One (value x class) count table per candidate, all built from the node's rows without filtering them
+        tables = data_handler.contingency_tables(attributes)
 
-        average_gain = 0
+        eligible = False
 
         for attr in attributes:
-            info_gain = data_handler.information_gain(attr)
+            if min(tables[attr].value_counts()) < self.__min_samples_leaf:
+                info_gain_by_attribute[all_attributes.index(attr)] = -1
 
-            info_gain_by_attribute[data_handler.attributes().index(attr)] = info_gain
+                logger.debug("Attr '" + attr + "' leaves less than " + str(self.__min_samples_leaf) + " instances")
 
-            average_gain += info_gain
+                continue
+
+            info_gain = tables[attr].information_gain()
+
+            info_gain_by_attribute[all_attributes.index(attr)] = info_gain
+            eligible = True
 
             logger.debug("Info. gain for '" + attr + "': " + str(info_gain))
 
-        return info_gain_by_attribute.index(max(info_gain_by_attribute))
+        if not eligible or (self.__min_gain > 0 and max(info_gain_by_attribute) < self.__min_gain):
+            return None, None
+
+        idx_most_informative_attr = info_gain_by_attribute.index(max(info_gain_by_attribute))
+
+        # With no gain at all, the first attribute may be chosen without being a candidate, so without a table
+        return idx_most_informative_attr, tables.get(all_attributes[idx_most_informative_attr])
 
     def __select_attributes(self, attributes):
         if len(attributes) > 10:
@@ -97,7 +276,7 @@ class ID3DecisionTree(object):
             selected_attrs = []
 
             while len(selected_attrs) < nattr:
-                selected_attr = attributes[random.randint(0, len(attributes) - 1)]
+                selected_attr = attributes[self.__rng.randint(0, len(attributes) - 1)]
 
                 if selected_attr not in selected_attrs:
                     selected_attrs.append(selected_attr)
@@ -119,29 +298,163 @@ class ID3DecisionTree(object):
 
             return text
 
+    def __branch(self, node, value):
+        branches = node["value"]
+        split = node["split"]
+
+        branch = None
+
+        if isinstance(value, float) and split is not None:
+            branch = split["branches"][bisect.bisect_left(split["cut_points"], value)]
+
+        elif value in branches:
+            branch = value
+
+        # In case of no value match, force a change
+        if branch is None:
+            branch = list(branches)[-1]
+
+        return branch
+
     def classify(self, test_instance):
         node = self.__dt
 
         while node["attr"] is not None:
-            bk_node = node
+            node = node["value"][self.__branch(node, test_instance[node["attr"][0]])]
 
-            for value in node["value"]:
-                if isinstance(test_instance[node["attr"][0]], float):
-                    expression = value.format(test_instance[node["attr"][0]])
+        return node["value"]
 
-                    if bool(eval(expression)):
-                        node = node["value"][value]
-                        break
+    def __partition(self, node, column, idxs):
+        """
+        Distributes the indexes of the instances that reached a node among its branches
 
-                if test_instance[node["attr"][0]] == value:
-                    node = node["value"][value]
-                    break
+        :return: A dict like {<branch>: <indexes>, ...}
+        :rtype: dict
+        """
 
-            # In case of no value match, force a change
-            if node == bk_node:
-                node = node["value"][value]
+        split = node["split"]
 
-        return node["value"]
+        if split is not None and np is not None and isinstance(column, np.ndarray):
+            slots = np.searchsorted(split["cut_points"], column[idxs], side="left")
+            last_branch = list(node["value"])[-1]
+
+            partitions = {}
+
+            for idx_slot, branch in enumerate(split["branches"]):
+                slot_idxs = idxs[slots == idx_slot]
+
+                if len(slot_idxs) > 0:
+                    # In case of no value match, force a change
+                    branch = last_branch if branch is None else branch
+
+                    if branch in partitions:
+                        slot_idxs = np.concatenate((partitions[branch], slot_idxs))
+
+                    partitions[branch] = slot_idxs
+
+            return partitions
+
+        partitions = {}
+
+        for idx in idxs:
+            partitions.setdefault(self.__branch(node, column[idx]), []).append(idx)
+
+        return partitions
+
+    def classify_many(self, instances):
+        """
+        Classifies many instances at once, routing them down the tree together: at each node, the indexes of the
+        instances that reached it are partitioned among its branches
+
+        :param list instances: A list of attribute tuples, or a 2-D array with one instance per row
+        :return: The classification of each instance, in order
+        :rtype: list
+        """
+
+        classified = [None] * len(instances)
+
+        if len(instances) == 0:
+            return classified
+
+        columns = instances_as_columns(instances)
+
+        pending = [(self.__dt, instances_indexes(instances))]
+
+        while pending:
+            node, idxs = pending.pop()
+
+            if node["attr"] is None:
+                for idx in idxs:
+                    classified[idx] = node["value"]
+
+                continue
+
+            partitions = self.__partition(node, columns[node["attr"][0]], idxs)
+
+            for branch in partitions:
+                pending.append((node["value"][branch], partitions[branch]))
+
+        return classified
+
+    def report(self):
+        """
+        :return: The size of the tree, as given by FlatTree.report
+        :rtype: dict
+        """
+
+        return self.flatten().report()
+
+    def classify_encoded(self, encoded):
+        """
+        Classifies many instances given as dictionary-encoded columns, routing them by their codes
+
+        :param list encoded: The attribute columns, as given by DataHandler.encoded_attributes
+        :return: The classification of each instance, in order
+        :rtype: list
+        """
+
+        return self.flatten().classify_encoded(encoded)
+
+    def flatten(self):
+        """
+        Converts the tree into parallel node arrays, which take less memory and classify with the same semantics
+
+        :return: The compact tree
+        :rtype: FlatTree
+        """
+
+        return FlatTree(self.__dt)
+
+    def save(self, path, cut_points=None):
+        """
+        Saves the tree to a binary model file, in its compact form
+
+        :param string path: The file to write
+        :param dict cut_points: The discretization cut points of each attribute, like {<name>: [<cut point>, ...]}.
+        Defaults to the ones found in the tree
+        """
+
+        tree = self.flatten()
+
+        save_trees(path, [tree], {"kind": "tree", "attributes": self.__attributes, "class_attr": self.__class_attr,
+                                  "cut_points": tree.cut_points() if cut_points is None else cut_points})
+
+    @staticmethod
+    def load(path):
+        """
+        Loads a tree saved by ID3DecisionTree.save, memory-mapping the file
+
+        :param string path: The file to read
+        :return: A tuple with the compact tree and the metadata of the file
+        :rtype: tuple
+        """
+
+        trees, metadata = load_trees(path)
+
+        if metadata.get("kind") != "tree":
+            raise AttributeError("Model kind is not supported!")
+
+        return trees[0], metadata
 
     def __str__(self):
         return self.__tree_as_string(self.__dt, 0).strip()
@@ -0,0 +1,560 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import logging
+import random
+
+from data.columnar import np, require_numpy, quantile_bins
+from data.thresholds import interval_labels
+
+logger = logging.getLogger("main")
+
+
+def __entropies(counts):
+    """
+    :param numpy.ndarray counts: Class counts, with the classes in the last axis
+    :return: The entropy of each distribution, in bits, or 0 for the empty ones
+    :rtype: numpy.ndarray
+    """
+
+    totals = counts.sum(axis=-1, keepdims=True)
+    probabilities = counts / np.where(totals > 0, totals, 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(probabilities > 0, probabilities * np.log2(probabilities), 0)
+
+    return -terms.sum(axis=-1)
+
+
+def __information_gains(counts):
+    """
+    :param numpy.ndarray counts: A (node x value x class) count table of one attribute
+    :return: The information gain of the attribute at each node
+    :rtype: numpy.ndarray
+    """
+
+    value_totals = counts.sum(axis=2)
+    node_totals = value_totals.sum(axis=1)
+
+    mean_entropies = (value_totals * __entropies(counts)).sum(axis=1) / np.where(node_totals > 0, node_totals, 1)
+
+    return __entropies(counts.sum(axis=1)) - mean_entropies
+
+
+def __first_appearances(keys, size):
+    """
+    :return: The position of the first row with each key, or the number of rows for the keys that never appear
+    :rtype: numpy.ndarray
+    """
+
+    first = np.full(size, len(keys), dtype=np.intp)
+
+    uniques, first_idx = np.unique(keys, return_index=True)
+    first[uniques] = first_idx
+
+    return first
+
+
+def __most_occurred_class(counts, first, classes, rng):
+    """
+    Picks the majority class as DataHandler.most_occurred_class does, with the classes in order of first appearance
+
+    """
+
+    order = [yi for yi in np.argsort(first, kind="stable").tolist() if counts[yi] > 0]
+
+    most_occurred_class_count = max(counts[yi] for yi in order)
+    most_occurred_class = [classes[yi] for yi in order if counts[yi] == most_occurred_class_count]
+
+    try:
+        return most_occurred_class[rng.randint(0, 1)]
+    except IndexError:
+        return most_occurred_class[0]
+
+
+def build_level_wise(data_handler, select_attributes, max_depth=None, min_samples_split=2, min_samples_leaf=1,
+                     min_gain=0.0, rng=random):
+    """
+    Grows an ID3 tree breadth-first, one level at a time, over a single array assigning each training row to its open
+    node. At each level, the (node x value x class) counts of a candidate attribute are built for every open node at
+    once, in one vectorized pass over its column, instead of building a DataHandler per node. Columnar backend only
+
+    Unlike the recursive build, each node only excludes the attributes already used on its own path, and the attribute
+    with the most information gain is always chosen among the node's candidates
+
+    :param DataHandler data_handler: The training data
+    :param function select_attributes: Picks the candidate attributes of a node from its available attributes
+    :param integer max_depth: If given, the nodes at this depth (the root being at 0) become leaves
+    :param integer min_samples_split: Nodes with less instances become leaves
+    :param integer min_samples_leaf: Splits leaving a child with less instances are not considered
+    :param float min_gain: If greater than 0, nodes whose best split has a lower information gain become leaves
+    :param random.Random rng: The random generator breaking ties between majority classes
+    :return: The root node, as the nodes of ID3DecisionTree, without their compiled splits
+    :rtype: dict
+    """
+
+    require_numpy()
+
+    if not data_handler.is_columnar():
+        raise AttributeError("Level-wise build without the columnar backend is not supported!")
+
+    all_attributes = data_handler.attributes()
+    idx_by_attr = {attr: idx_attr for idx_attr, attr in enumerate(all_attributes)}
+    columns, (class_codes, classes), weights = data_handler.coded_columns()
+
+    if weights is None:
+        weights = np.ones(len(class_codes), dtype=np.int64)
+
+    n_classes = len(classes)
+
+    root = {"attr": None, "value": {}}
+
+    # The open nodes of the level, the attributes still available to each one, and the node of each active row
+    level = [root]
+    available = np.ones((1, len(all_attributes)), dtype=bool)
+    rows = np.arange(len(class_codes))
+    assign = np.zeros(len(rows), dtype=np.intp)
+
+    depth = 0
+
+    while level:
+        n_nodes = len(level)
+
+        row_classes = class_codes[rows]
+        row_weights = weights[rows]
+        node_class_keys = assign * n_classes + row_classes
+
+        class_counts = np.bincount(node_class_keys, row_weights, minlength=n_nodes * n_classes)
+        class_counts = class_counts.astype(np.int64).reshape(n_nodes, n_classes)
+
+        pure = np.count_nonzero(class_counts, axis=1) == 1
+        exhausted = ~pure & (~available.any(axis=1) | __stopped(class_counts, depth, max_depth, min_samples_split))
+
+        for idx_node, yi in zip(np.flatnonzero(pure).tolist(), class_counts[pure].argmax(axis=1).tolist()):
+            level[idx_node]["value"] = classes[yi]
+
+        class_first = None
+
+        # Nodes are visited in order, so the random choices only depend on the shape of the tree
+        candidates = np.zeros((n_nodes, len(all_attributes)), dtype=bool)
+
+        for idx_node in np.flatnonzero(~pure).tolist():
+            if exhausted[idx_node]:
+                if class_first is None:
+                    class_first = __first_appearances(node_class_keys, n_nodes * n_classes).reshape(n_nodes, n_classes)
+
+                level[idx_node]["value"] = __most_occurred_class(class_counts[idx_node], class_first[idx_node], classes,
+                                                                 rng)
+
+            else:
+                attributes = [all_attributes[idx_attr] for idx_attr in np.flatnonzero(available[idx_node]).tolist()]
+
+                candidates[idx_node, [idx_by_attr[attr] for attr in select_attributes(attributes)]] = True
+
+        # One count pass per candidate attribute, shared by all the nodes of the level
+        gains = np.full((n_nodes, len(all_attributes)), -np.inf)
+
+        for idx_attr in np.flatnonzero(candidates.any(axis=0)).tolist():
+            codes, values = columns[idx_attr]
+
+            keys = (assign * len(values) + codes[rows]) * n_classes + row_classes
+            counts = np.bincount(keys, row_weights, minlength=n_nodes * len(values) * n_classes)
+            counts = counts.reshape(n_nodes, len(values), n_classes)
+
+            attr_gains = __information_gains(counts)
+            attr_gains[__small_children(counts.sum(axis=2), min_samples_leaf)] = -np.inf
+
+            gains[:, idx_attr] = np.where(candidates[:, idx_attr], attr_gains, -np.inf)
+
+        # The attribute each node splits by, or -1 for the leaves
+        best_gains = gains[np.arange(n_nodes), gains.argmax(axis=1)]
+        splits = candidates.any(axis=1) & np.isfinite(best_gains)
+
+        if min_gain > 0:
+            splits &= best_gains >= min_gain
+
+        chosen = np.where(splits, gains.argmax(axis=1), -1)
+
+        for idx_node in np.flatnonzero(candidates.any(axis=1) & ~splits).tolist():
+            if class_first is None:
+                class_first = __first_appearances(node_class_keys, n_nodes * n_classes).reshape(n_nodes, n_classes)
+
+            level[idx_node]["value"] = __most_occurred_class(class_counts[idx_node], class_first[idx_node], classes,
+                                                             rng)
+
+        keep = chosen[assign] >= 0
+        rows = rows[keep]
+        assign = assign[keep]
+
+        # The code of each remaining row for the attribute its node splits by
+        row_attrs = chosen[assign]
+        split_attrs = np.unique(row_attrs).tolist()
+
+        row_codes = np.empty(len(rows), dtype=np.intp)
+
+        for idx_attr in split_attrs:
+            matches = row_attrs == idx_attr
+            row_codes[matches] = columns[idx_attr][0][rows[matches]]
+
+        max_values = max([len(columns[idx_attr][1]) for idx_attr in split_attrs] or [1])
+
+        # The children of each node, as its distinct (node, code) pairs, numbered in order of first appearance
+        child_keys, first_idx, inverse = np.unique(assign * max_values + row_codes, return_index=True,
+                                                   return_inverse=True)
+        order = np.lexsort((first_idx, child_keys // max_values))
+
+        rank = np.empty(len(order), dtype=np.intp)
+        rank[order] = np.arange(len(order))
+        assign = rank[inverse.reshape(-1)]
+
+        parents, child_codes = np.divmod(child_keys[order], max_values)
+        chosen_list = chosen.tolist()
+
+        next_level = []
+
+        for idx_node, code in zip(parents.tolist(), child_codes.tolist()):
+            node = level[idx_node]
+            idx_attr = chosen_list[idx_node]
+
+            child = {"attr": None, "value": {}}
+
+            node["attr"] = (idx_attr, all_attributes[idx_attr])
+            node["value"][columns[idx_attr][1][code]] = child
+
+            next_level.append(child)
+
+        available = available[parents]
+        available[np.arange(len(parents)), chosen[parents]] = False
+
+        logger.debug("Level " + str(depth) + ": " + str(n_nodes) + " nodes, " + str(len(rows)) + " rows to split")
+
+        level = next_level
+        depth += 1
+
+    return root
+
+
+def __stopped(class_counts, depth, max_depth, min_samples_split):
+    """
+    :return: Which nodes of a level the growth limits turn into leaves before looking for a split
+    :rtype: numpy.ndarray
+    """
+
+    stopped = class_counts.sum(axis=1) < min_samples_split
+
+    if max_depth is not None and depth >= max_depth:
+        stopped[:] = True
+
+    return stopped
+
+
+def __small_children(value_totals, min_samples_leaf):
+    """
+    :param numpy.ndarray value_totals: The (node x value) instance counts of an attribute
+    :return: Which nodes would have a child with less than min_samples_leaf instances when split by the attribute
+    :rtype: numpy.ndarray
+    """
+
+    return ((value_totals > 0) & (value_totals < min_samples_leaf)).any(axis=1)
+
+
+def __histograms(bins, n_bins, rows, assign, n_nodes, class_codes, weights, n_classes):
+    """
+    Counts, in one pass over the bins of each attribute, the (node x bin x class) histograms of the given rows
+
+    :return: The histogram of each attribute, as an integer array
+    :rtype: list
+    """
+
+    row_classes = class_codes[rows]
+    row_weights = weights[rows]
+
+    histograms = []
+
+    for attr_bins, attr_n_bins in zip(bins, n_bins):
+        keys = (assign * attr_n_bins + attr_bins[rows]) * n_classes + row_classes
+        counts = np.bincount(keys, row_weights, minlength=n_nodes * attr_n_bins * n_classes)
+
+        histograms.append(counts.astype(np.int64).reshape(n_nodes, attr_n_bins, n_classes))
+
+    return histograms
+
+
+def __best_thresholds(histogram, class_counts, xlogx, min_samples_leaf=1):
+    """
+    Finds, at each node, the bin after which a binary split of the attribute has the most information gain. With n
+    instances and class counts c, n times the entropy is n*log2(n) - sum(c*log2(c)), so the gains are computed from a
+    table of x*log2(x) for the integer counts, instead of the logarithms of every (node x bin x class) probability
+
+    :param numpy.ndarray histogram: The (node x bin x class) histogram of the attribute
+    :param numpy.ndarray class_counts: The (node x class) counts
+    :param numpy.ndarray xlogx: The x*log2(x) of each count, up to the number of instances
+    :param integer min_samples_leaf: Minimum number of instances of each side
+    :return: A tuple with the best bin and its gain at each node, -inf where no split leaves enough instances on both
+    sides
+    :rtype: tuple
+    """
+
+    n_nodes = len(class_counts)
+
+    if histogram.shape[1] < 2:
+        return np.zeros(n_nodes, dtype=np.intp), np.full(n_nodes, -np.inf)
+
+    left = np.cumsum(histogram, axis=1)[:, :-1, :]
+    right = class_counts[:, np.newaxis, :] - left
+
+    left_totals = left.sum(axis=2)
+    right_totals = right.sum(axis=2)
+    totals = class_counts.sum(axis=1)
+
+    info = xlogx[totals] - xlogx[class_counts].sum(axis=1)
+    info_attr = xlogx[left_totals] - xlogx[left].sum(axis=2) + xlogx[right_totals] - xlogx[right].sum(axis=2)
+
+    # Rounded, so the gains only apart by rounding errors tie, and the first threshold is kept
+    gains = np.round((info[:, np.newaxis] - info_attr) / np.maximum(totals, 1)[:, np.newaxis], 12)
+    gains[(left_totals < max(min_samples_leaf, 1)) | (right_totals < max(min_samples_leaf, 1))] = -np.inf
+
+    best = gains.argmax(axis=1)
+
+    return best, gains[np.arange(n_nodes), best]
+
+
+def build_histogram_level_wise(data_handler, select_attributes, max_bins=255, max_depth=None, min_samples_split=2,
+                               min_samples_leaf=1, min_gain=0.0, rng=random):
+    """
+    Grows a tree level by level, as build_level_wise, splitting the numeric attributes without discretizing them
+    first. Each numeric column is binned once into at most max_bins quantile bins, and each node splits it in two at
+    the bin boundary with the most information gain, found from the (bin x class) histogram of the node. Numeric
+    attributes can be split again further down the path, at other thresholds. The other attributes are split by value,
+    once per path, from the histogram of their values
+
+    The histograms of the children of a node are counted directly for all of them but the largest one, which is the
+    node's histogram minus the ones of its siblings. Nodes without any split of positive gain become leaves. Columnar
+    backend only
+
+    :param DataHandler data_handler: The training data
+    :param function select_attributes: Picks the candidate attributes of a node from its available attributes
+    :param integer max_bins: Maximum number of bins of each numeric attribute, up to 256
+    :param integer max_depth: If given, the nodes at this depth (the root being at 0) become leaves
+    :param integer min_samples_split: Nodes with less instances become leaves
+    :param integer min_samples_leaf: Splits leaving a child with less instances are not considered
+    :param float min_gain: Nodes whose best split has a lower information gain become leaves
+    :param random.Random rng: The random generator breaking ties between majority classes
+    :return: The root node, as the nodes of ID3DecisionTree, without their compiled splits
+    :rtype: dict
+    """
+
+    require_numpy()
+
+    if not data_handler.is_columnar():
+        raise AttributeError("Histogram build without the columnar backend is not supported!")
+
+    all_attributes = data_handler.attributes()
+    numeric_attributes = set(data_handler.numeric_attributes())
+    idx_by_attr = {attr: idx_attr for idx_attr, attr in enumerate(all_attributes)}
+    columns, (class_codes, classes), weights = data_handler.coded_columns()
+
+    if weights is None:
+        weights = np.ones(len(class_codes), dtype=np.int64)
+
+    n_classes = len(classes)
+
+    # The bin of each row for every attribute: a quantile bin for the numeric ones, the value code for the others
+    numeric = np.array([attr in numeric_attributes for attr in all_attributes], dtype=bool)
+    bins = []
+    bin_values = []
+
+    for (codes, values), is_numeric_attr in zip(columns, numeric.tolist()):
+        if is_numeric_attr:
+            attr_bins, edges = quantile_bins(np.asarray(values, dtype=np.float64)[codes], max_bins, weights)
+
+            bins.append(attr_bins)
+            bin_values.append(edges.tolist())
+        else:
+            bins.append(codes)
+            bin_values.append(values)
+
+    n_bins = [len(values) + 1 if is_numeric_attr else len(values)
+              for values, is_numeric_attr in zip(bin_values, numeric.tolist())]
+
+    xlogx = np.arange(int(weights.sum()) + 1, dtype=np.float64)
+    xlogx[1:] *= np.log2(xlogx[1:])
+
+    root = {"attr": None, "value": {}}
+
+    # The open nodes of the level, the attributes still available to each one, and the node of each active row
+    level = [root]
+    available = np.ones((1, len(all_attributes)), dtype=bool)
+    rows = np.arange(len(class_codes))
+    assign = np.zeros(len(rows), dtype=np.intp)
+
+    histograms = __histograms(bins, n_bins, rows, assign, 1, class_codes, weights, n_classes)
+
+    depth = 0
+
+    while level:
+        n_nodes = len(level)
+
+        if histograms:
+            class_counts = histograms[0].sum(axis=1)
+        else:
+            class_counts = np.bincount(assign * n_classes + class_codes[rows], weights[rows],
+                                       minlength=n_nodes * n_classes).astype(np.int64).reshape(n_nodes, n_classes)
+
+        pure = np.count_nonzero(class_counts, axis=1) == 1
+
+        for idx_node, yi in zip(np.flatnonzero(pure).tolist(), class_counts[pure].argmax(axis=1).tolist()):
+            level[idx_node]["value"] = classes[yi]
+
+        # Nodes are visited in order, so the random choices only depend on the shape of the tree
+        candidates = np.zeros((n_nodes, len(all_attributes)), dtype=bool)
+
+        stopped = __stopped(class_counts, depth, max_depth, min_samples_split)
+
+        for idx_node in np.flatnonzero(~pure & available.any(axis=1) & ~stopped).tolist():
+            attributes = [all_attributes[idx_attr] for idx_attr in np.flatnonzero(available[idx_node]).tolist()]
+
+            candidates[idx_node, [idx_by_attr[attr] for attr in select_attributes(attributes)]] = True
+
+        gains = np.full((n_nodes, len(all_attributes)), -np.inf)
+        best_bins = np.zeros((n_nodes, len(all_attributes)), dtype=np.intp)
+
+        for idx_attr in np.flatnonzero(candidates.any(axis=0)).tolist():
+            if numeric[idx_attr]:
+                best_bins[:, idx_attr], attr_gains = __best_thresholds(histograms[idx_attr], class_counts, xlogx,
+                                                                       min_samples_leaf)
+            else:
+                attr_gains = np.round(__information_gains(histograms[idx_attr]), 12)
+                attr_gains[__small_children(histograms[idx_attr].sum(axis=2), min_samples_leaf)] = -np.inf
+
+            gains[:, idx_attr] = np.where(candidates[:, idx_attr], attr_gains, -np.inf)
+
+        # On ties, the first attribute is chosen
+        chosen = gains.argmax(axis=1)
+        best_gains = gains[np.arange(n_nodes), chosen]
+        splits = (best_gains > 0) & (best_gains >= min_gain)
+
+        class_first = None
+
+        for idx_node in np.flatnonzero(~pure & ~splits).tolist():
+            if class_first is None:
+                node_class_keys = assign * n_classes + class_codes[rows]
+                class_first = __first_appearances(node_class_keys, n_nodes * n_classes).reshape(n_nodes, n_classes)
+
+            level[idx_node]["value"] = __most_occurred_class(class_counts[idx_node], class_first[idx_node], classes,
+                                                             rng)
+
+        # The children of the split nodes, as slots: two for a numeric split, one per value otherwise. Pure children
+        # are closed right away, and only the open ones are numbered as nodes of the next level
+        slot_offsets = np.zeros(n_nodes, dtype=np.intp)
+        slot_children = []
+
+        next_level = []
+        parents = []
+        derived = []
+
+        for idx_node in np.flatnonzero(splits).tolist():
+            node = level[idx_node]
+            idx_attr = int(chosen[idx_node])
+            histogram = histograms[idx_attr][idx_node]
+
+            if numeric[idx_attr]:
+                best_bin = best_bins[idx_node, idx_attr]
+                left_counts = histogram[:best_bin + 1].sum(axis=0)
+
+                slots_counts = [left_counts, class_counts[idx_node] - left_counts]
+                labels = interval_labels([bin_values[idx_attr][best_bin]])
+            else:
+                slots_counts = histogram
+                labels = bin_values[idx_attr]
+
+            node["attr"] = (idx_attr, all_attributes[idx_attr])
+            slot_offsets[idx_node] = len(slot_children)
+
+            open_children = []
+            all_open = True
+
+            for label, counts in zip(labels, slots_counts):
+                present = np.flatnonzero(counts)
+
+                if len(present) == 0:
+                    slot_children.append(-1)
+                    continue
+
+                child = {"attr": None, "value": {}}
+                node["value"][label] = child
+
+                if len(present) == 1:
+                    child["value"] = classes[present[0]]
+                    slot_children.append(-1)
+                    all_open = False
+                    continue
+
+                open_children.append((int(counts.sum()), len(next_level)))
+                slot_children.append(len(next_level))
+
+                next_level.append(child)
+                parents.append(idx_node)
+
+            # With every sibling counted, the largest child is the node minus its siblings
+            if all_open and len(open_children) > 1:
+                derived.append(max(open_children)[1])
+
+        logger.debug("Level " + str(depth) + ": " + str(n_nodes) + " nodes, " + str(len(rows)) + " rows")
+
+        # Moves the rows of the split nodes to their open children
+        keep = splits[assign]
+        rows = rows[keep]
+        assign = assign[keep]
+
+        row_attrs = chosen[assign]
+        row_slots = np.empty(len(rows), dtype=np.intp)
+
+        for idx_attr in np.unique(row_attrs).tolist():
+            matches = row_attrs == idx_attr
+            attr_bins = bins[idx_attr][rows[matches]]
+
+            if numeric[idx_attr]:
+                row_slots[matches] = attr_bins > best_bins[assign[matches], idx_attr]
+            else:
+                row_slots[matches] = attr_bins
+
+        children = np.array(slot_children, dtype=np.intp)[slot_offsets[assign] + row_slots]
+        rows = rows[children >= 0]
+        assign = children[children >= 0]
+
+        parents = np.array(parents, dtype=np.intp)
+        derived = np.array(derived, dtype=np.intp)
+
+        # Counts the histograms of every child but the derived ones
+        counted = np.ones(len(next_level), dtype=bool)
+        counted[derived] = False
+
+        counted_rows = counted[assign]
+        child_histograms = __histograms(bins, n_bins, rows[counted_rows], assign[counted_rows], len(next_level),
+                                        class_codes, weights, n_classes)
+
+        if len(derived):
+            # The counted children with a derived sibling
+            has_derived = np.zeros(n_nodes, dtype=bool)
+            has_derived[parents[derived]] = True
+            siblings = np.flatnonzero(counted & has_derived[parents])
+
+            for histogram, child_histogram in zip(histograms, child_histograms):
+                sibling_sums = np.zeros_like(histogram)
+                np.add.at(sibling_sums, parents[siblings], child_histogram[siblings])
+
+                child_histogram[derived] = histogram[parents[derived]] - sibling_sums[parents[derived]]
+
+        available = available[parents]
+
+        # The attributes split by value are used once per path
+        by_value = ~numeric[chosen[parents]]
+        available[np.flatnonzero(by_value), chosen[parents][by_value]] = False
+
+        level = next_level
+        histograms = child_histograms
+        depth += 1
+
+    return root
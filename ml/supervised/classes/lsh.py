@@ -0,0 +1,103 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import math
+
+from data.columnar import np, require_numpy
+from .neighbors import squared_distances, top_k
+
+
+class RandomProjectionLSH(object):
+    """
+    An approximate nearest neighbor index, hashing the points by the side of random hyperplanes they fall on. Each of
+    the tables hashes with its own hyperplanes, and the candidates of a query are the points sharing a bucket with it in
+    any table, which are then ranked by their exact distances. More tables find more of the true neighbors (recall),
+    more bits per hash give smaller buckets (speed)
+
+    """
+
+    __points = None
+    __center = None
+    __projections = None
+    __buckets = None
+
+    def __init__(self, points, n_tables=8, n_bits=None, seed=None):
+        """
+        Constructor of the class
+
+        :param list points: The points to index, as tuples of coordinates
+        :param integer n_tables: Number of hash tables
+        :param integer n_bits: Number of hyperplanes of each hash. Defaults to about 16 points per bucket
+        :param integer seed: The seed of the random hyperplanes
+        """
+
+        require_numpy()
+
+        self.__points = np.array(points, dtype=np.float64).reshape(len(points), -1)
+
+        if n_bits is None:
+            n_bits = max(1, int(math.log(max(len(self.__points), 1) / 16, 2))) if len(self.__points) > 32 else 1
+
+        random_state = np.random.RandomState(seed)
+
+        self.__center = self.__points.mean(axis=0) if len(self.__points) else 0
+        self.__projections = random_state.normal(size=(n_tables, self.__points.shape[1], min(n_bits, 62)))
+
+        self.__buckets = []
+
+        for table_codes in self.__hash(self.__points):
+            order = np.argsort(table_codes, kind="stable")
+            starts = np.flatnonzero(np.diff(table_codes[order])) + 1
+
+            buckets = np.split(order, starts)
+            codes = table_codes[order[np.concatenate(([0], starts))]] if len(order) else []
+
+            self.__buckets.append(dict(zip(np.asarray(codes).tolist(), buckets)))
+
+    def __hash(self, points):
+        """
+        :return: The code of each point in each table, as a (tables x points) matrix
+        :rtype: numpy.ndarray
+        """
+
+        bits = np.einsum("nd,tdb->tnb", points - self.__center, self.__projections) > 0
+
+        return bits.dot(1 << np.arange(bits.shape[2], dtype=np.int64))
+
+    def __len__(self):
+        return len(self.__points)
+
+    def query(self, points, k):
+        """
+        Finds approximately the k nearest points of each query point. When its buckets hold less than k candidates,
+        a query falls back to all of the points
+
+        :param list points: The query points, as tuples of coordinates
+        :param integer k: Number of neighbors, at most the number of indexed points
+        :return: A tuple with a (len(points) x k) matrix of neighbor indexes, nearest first and, on ties, by index, and
+        the number of candidates ranked for each query
+        :rtype: tuple
+        """
+
+        points = np.array(points, dtype=np.float64).reshape(len(points), -1)
+        codes = self.__hash(points)
+
+        neighbors = np.empty((len(points), k), dtype=np.intp)
+        candidate_counts = np.empty(len(points), dtype=np.intp)
+
+        empty = np.empty(0, dtype=np.intp)
+
+        for row in range(0, len(points)):
+            candidates = np.unique(np.concatenate([buckets.get(code, empty) for buckets, code
+                                                   in zip(self.__buckets, codes[:, row].tolist())]))
+
+            if len(candidates) < k:
+                candidates = np.arange(len(self.__points))
+
+            distances = squared_distances(points[row:row + 1], self.__points[candidates])
+
+            neighbors[row] = top_k(distances, candidates[None, :], k)[1][0]
+            candidate_counts[row] = len(candidates)
+
+        return neighbors, candidate_counts
@@ -0,0 +1,111 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from .flat_tree import FlatTree
+
+# Layout: magic, version and metadata size, the metadata as JSON, then the arrays of every tree, each one aligned
+MAGIC = b"ID3MODEL"
+VERSION = 1
+ALIGNMENT = 8
+
+__preamble = struct.Struct("<8sII")
+
+
+def __padding(size):
+    return (ALIGNMENT - size % ALIGNMENT) % ALIGNMENT
+
+
+def save_trees(path, trees, metadata=None):
+    """
+    Writes the trees to a binary model file: their node arrays, as raw machine values, after a JSON metadata block with
+    the value tables of each tree and the offsets of its arrays
+
+    :param string path: The file to write
+    :param list trees: The trees, as FlatTrees
+    :param dict metadata: Extra metadata, like the attribute names, the class attribute or the discretization cut points
+    """
+
+    metadata = dict(metadata or {})
+    metadata["byteorder"] = sys.byteorder
+    metadata["itemsizes"] = {typecode: array(typecode).itemsize for typecode in set(FlatTree.array_typecodes)}
+    metadata["trees"] = []
+
+    offset = 0
+
+    for tree in trees:
+        offsets = []
+
+        for values in tree.as_arrays():
+            size = len(values) * values.itemsize
+
+            offsets.append([offset, len(values)])
+            offset += size + __padding(size)
+
+        metadata["trees"].append({"tables": tree.tables(), "arrays": offsets})
+
+    encoded_metadata = json.dumps(metadata).encode("utf-8")
+    encoded_metadata += b" " * __padding(__preamble.size + len(encoded_metadata))
+
+    with open(path, "wb") as model_file:
+        model_file.write(__preamble.pack(MAGIC, VERSION, len(encoded_metadata)))
+        model_file.write(encoded_metadata)
+
+        for tree in trees:
+            for values in tree.as_arrays():
+                size = len(values) * values.itemsize
+
+                model_file.write(values.tobytes())
+                model_file.write(b"\0" * __padding(size))
+
+
+def load_trees(path):
+    """
+    Reads the trees of a binary model file by memory-mapping it, so loading costs no parsing and processes loading the
+    same file share its pages. The arrays of the trees are read-only views over the mapping
+
+    :param string path: The file to read
+    :return: A tuple with the trees, as FlatTrees, and the metadata
+    :rtype: tuple
+    """
+
+    with open(path, "rb") as model_file:
+        mapping = mmap.mmap(model_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    buffer = memoryview(mapping)
+
+    magic, version, metadata_size = __preamble.unpack_from(buffer, 0)
+
+    if magic != MAGIC:
+        raise AttributeError("File format is not supported!")
+
+    if version != VERSION:
+        raise AttributeError("Model version is not supported!")
+
+    start = __preamble.size + metadata_size
+    metadata = json.loads(bytes(buffer[__preamble.size:start]).decode("utf-8"))
+
+    itemsizes = {typecode: array(typecode).itemsize for typecode in FlatTree.array_typecodes}
+
+    if metadata["byteorder"] != sys.byteorder or metadata["itemsizes"] != itemsizes:
+        raise AttributeError("Model byte layout is not supported!")
+
+    trees = []
+
+    for tree_metadata in metadata.pop("trees"):
+        arrays = []
+
+        for typecode, (offset, length) in zip(FlatTree.array_typecodes, tree_metadata["arrays"]):
+            offset += start
+
+            arrays.append(buffer[offset:offset + length * itemsizes[typecode]].cast(typecode))
+
+        trees.append(FlatTree.from_arrays(arrays, tree_metadata["tables"]))
+
+    return trees, metadata
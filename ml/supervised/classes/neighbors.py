@@ -0,0 +1,201 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import os
+
+from data.columnar import np, require_numpy
+
+
+def squared_distances(test, train):
+    """
+    Squared euclidean distances between two blocks of points, as ||a||^2 + ||b||^2 - 2ab
+
+    :param numpy.ndarray test: The points of the rows, one per row
+    :param numpy.ndarray train: The points of the columns, one per row
+    :return: A (len(test) x len(train)) matrix of squared distances
+    :rtype: numpy.ndarray
+    """
+
+    distances = (test ** 2).sum(axis=1)[:, None] + (train ** 2).sum(axis=1)[None, :] - 2 * test.dot(train.T)
+
+    return np.maximum(distances, 0, out=distances)
+
+
+def top_k(distances, idxs, k):
+    """
+    Selects, in each row, the k smallest distances, ordered by distance and, on ties, by instance index
+
+    :param numpy.ndarray distances: The candidate distances, one row per test instance
+    :param numpy.ndarray idxs: The instance index of each candidate
+    :param integer k: Number of neighbors
+    :return: A tuple with the distances and the indexes of the k neighbors of each row
+    :rtype: tuple
+    """
+
+    if distances.shape[1] > k:
+        selected = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        selected_distances = np.take_along_axis(distances, selected, axis=1)
+
+        # argpartition breaks ties arbitrarily, so rows tied at the k-th distance are fully sorted
+        kth_distances = selected_distances.max(axis=1)
+        tied_rows = np.flatnonzero((distances <= kth_distances[:, None]).sum(axis=1) > k)
+
+        for row in tied_rows:
+            selected[row] = np.lexsort((idxs[row], distances[row]))[:k]
+
+        distances = np.take_along_axis(distances, selected, axis=1)
+        idxs = np.take_along_axis(idxs, selected, axis=1)
+
+    order = np.lexsort((idxs, distances), axis=-1)
+
+    return np.take_along_axis(distances, order, axis=1), np.take_along_axis(idxs, order, axis=1)
+
+
+def vote(knn_codes, n_classes):
+    """
+    Majority vote in each row of neighbor class codes. On ties, the class of the nearest neighbor wins
+
+    :param numpy.ndarray knn_codes: The class code of each neighbor, one row per test instance, nearest first
+    :param integer n_classes: Number of classes
+    :return: The winner class code of each row
+    :rtype: numpy.ndarray
+    """
+
+    n_rows, k = knn_codes.shape
+    rows = np.arange(n_rows)[:, None]
+
+    counts = np.bincount((rows * n_classes + knn_codes).ravel(), minlength=n_rows * n_classes)
+    counts = counts.reshape(n_rows, n_classes)
+
+    first_positions = np.full((n_rows, n_classes), k)
+    np.minimum.at(first_positions, (np.broadcast_to(rows, knn_codes.shape), knn_codes),
+                  np.broadcast_to(np.arange(k), knn_codes.shape))
+
+    return np.argmax(counts * (k + 1) - first_positions, axis=1)
+
+
+class DistanceCache(object):
+    """
+    The distances between the instances of a data set, computed once and shared by every fold and repetition of a
+    cross validation. Either the full matrix of squared distances is kept, or only a list with the nearest neighbors of
+    each instance, and both can be memory-mapped on disk
+
+    """
+
+    __points = None
+    __distances = None
+    __neighbors = None
+    __chunk_size = 1024
+
+    def __init__(self, instances, k_max=None, margin=None, path=None, chunk_size=1024):
+        """
+        Constructor of the class
+
+        :param list instances: A list of tuples like [((<attributes>), <classification>), ...]
+        :param integer k_max: If given, keeps only the k_max + margin nearest neighbors of each instance instead of the
+        full distance matrix
+        :param integer margin: Extra neighbors kept per instance, to make up for the ones masked out as test instances.
+        Defaults to k_max
+        :param string path: If given, a directory where the arrays are memory-mapped instead of kept in memory
+        :param integer chunk_size: Number of instances in each block of computed distances
+        """
+
+        require_numpy()
+
+        self.__points = np.array([instance[0] for instance in instances], dtype=np.float64)
+        self.__chunk_size = chunk_size
+
+        total = len(self.__points)
+
+        if k_max is None:
+            self.__distances = self.__allocate(path, "distances.npy", np.float64, (total, total))
+
+            for start in range(0, total, chunk_size):
+                self.__distances[start:start + chunk_size] = squared_distances(self.__points[start:start + chunk_size],
+                                                                               self.__points)
+
+            return
+
+        list_size = min(total - 1, k_max + (k_max if margin is None else margin))
+
+        self.__neighbors = self.__allocate(path, "neighbors.npy", np.intp, (total, list_size))
+
+        for start in range(0, total, chunk_size):
+            distances = squared_distances(self.__points[start:start + chunk_size], self.__points)
+
+            # An instance is never its own neighbor, as it is always in its own test fold
+            rows = np.arange(len(distances))
+            distances[rows, start + rows] = np.inf
+
+            idxs = np.broadcast_to(np.arange(total), distances.shape)
+
+            self.__neighbors[start:start + chunk_size] = top_k(distances, idxs, list_size)[1]
+
+    def __allocate(self, path, filename, dtype, shape):
+        if path is None:
+            return np.empty(shape, dtype=dtype)
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        return np.lib.format.open_memmap(os.path.join(path, filename), mode="w+", dtype=dtype, shape=shape)
+
+    def __len__(self):
+        return len(self.__points)
+
+    def neighbors(self, test_rows, train_rows, k):
+        """
+        Finds the k nearest training instances of each test instance, masking out every instance not in training
+
+        :param list test_rows: The indexes of the test instances
+        :param list train_rows: The indexes of the training instances
+        :param integer k: Number of neighbors
+        :return: A (len(test_rows) x k) matrix with the indexes of the neighbors, nearest first and, on ties, by index.
+        Missing neighbors, when there are less than k training instances, are filled with the first training instance
+        :rtype: numpy.ndarray
+        """
+
+        test_rows = np.asarray(test_rows, dtype=np.intp)
+        train_rows = np.sort(np.asarray(train_rows, dtype=np.intp))
+
+        n_neighbors = min(k, len(train_rows))
+
+        if self.__neighbors is None:
+            found = np.empty((len(test_rows), n_neighbors), dtype=np.intp)
+
+            for start in range(0, len(test_rows), self.__chunk_size):
+                distances = self.__distances[test_rows[start:start + self.__chunk_size][:, None], train_rows[None, :]]
+                idxs = np.broadcast_to(train_rows, distances.shape)
+
+                found[start:start + self.__chunk_size] = top_k(distances, idxs, n_neighbors)[1]
+
+        else:
+            found = self.__listed_neighbors(test_rows, train_rows, n_neighbors)
+
+        if n_neighbors < k:
+            padding = np.full((len(test_rows), k - n_neighbors), train_rows[0] if len(train_rows) else 0)
+            found = np.hstack((found, padding))
+
+        return found
+
+    def __listed_neighbors(self, test_rows, train_rows, k):
+        is_train = np.zeros(len(self.__points), dtype=bool)
+        is_train[train_rows] = True
+
+        candidates = self.__neighbors[test_rows]
+        valid = is_train[candidates]
+
+        found = np.empty((len(test_rows), k), dtype=np.intp)
+
+        for row in range(0, len(test_rows)):
+            row_neighbors = candidates[row][valid[row]][:k]
+
+            # Too many of the listed neighbors are masked out, so the distances are computed again
+            if len(row_neighbors) < k:
+                distances = squared_distances(self.__points[test_rows[row:row + 1]], self.__points[train_rows])
+                row_neighbors = top_k(distances, train_rows[None, :], k)[1][0]
+
+            found[row] = row_neighbors
+
+        return found
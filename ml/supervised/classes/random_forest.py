@@ -0,0 +1,255 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import array
+import logging
+import multiprocessing
+import random
+
+from .id3_decision_tree import ID3DecisionTree
+from .model_file import save_trees, load_trees
+
+logger = logging.getLogger("main")
+
+# The training data of the forest and how to grow its trees, shipped once to each worker process
+__forest_data_handler = None
+__forest_builder = "recursive"
+__forest_limits = None
+
+
+def train_tree(data_handler, seed, builder="recursive", limits=None):
+    """
+    Trains one tree of the forest on a bootstrap of the data, with its own random generator, so the tree only depends
+    on the seed and not on the global random state
+
+    :param DataHandler data_handler: The training data
+    :param integer seed: The seed of the bootstrap and of the random choices of the tree
+    :param string builder: How to grow the tree, as in ID3DecisionTree
+    :param dict limits: The growth limits of the tree, as keyword arguments of ID3DecisionTree, like {"max_depth": 8}
+    :return: A tuple with the compact tree and the indexes of the instances left out of its bootstrap
+    :rtype: tuple
+    """
+
+    rng = random.Random(seed)
+
+    weights = data_handler.bootstrap_weights(rng=rng)
+
+    out_of_bag = array.array("i", [idx for idx, weight in enumerate(weights) if weight == 0])
+
+    tree = ID3DecisionTree(data_handler.weighted_subset(weights), builder=builder, rng=rng, **(limits or {}))
+
+    return tree.flatten(), out_of_bag
+
+
+def __init_worker(data_handler, builder, limits):
+    global __forest_data_handler, __forest_builder, __forest_limits
+
+    __forest_data_handler = data_handler
+    __forest_builder = builder
+    __forest_limits = limits
+
+
+def __train_tree_in_worker(seed):
+    return train_tree(__forest_data_handler, seed, __forest_builder, __forest_limits)
+
+
+def train_trees(data_handler, k, n_jobs=1, builder="recursive", limits=None, rng=random):
+    """
+    Trains the trees of a forest, in a pool of n_jobs processes if n_jobs is greater than 1. The seed of each tree is
+    drawn up front from rng, so the same seed gives the same forest for any number of processes
+
+    :param DataHandler data_handler: The training data
+    :param integer k: Number of trees
+    :param integer n_jobs: Number of processes, or a value below 1 to use all of the CPUs
+    :param string builder: How to grow the trees, as in ID3DecisionTree
+    :param dict limits: The growth limits of the trees, as keyword arguments of ID3DecisionTree
+    :param random.Random rng: The random generator drawing the seeds of the trees. Defaults to the global one
+    :return: A list of (<tree>, <out-of-bag indexes>) tuples, as returned by train_tree
+    :rtype: list
+    """
+
+    seeds = [rng.randrange(2 ** 31) for i in range(k)]
+
+    if n_jobs < 1:
+        n_jobs = multiprocessing.cpu_count()
+
+    n_jobs = min(n_jobs, k)
+
+    if n_jobs <= 1:
+        return [train_tree(data_handler, seed, builder, limits) for seed in seeds]
+
+    pool = multiprocessing.Pool(n_jobs, __init_worker, (data_handler, builder, limits))
+
+    try:
+        return pool.map(__train_tree_in_worker, seeds)
+    finally:
+        pool.close()
+        pool.join()
+
+
+class RandomForest(object):
+    """
+    A forest of ID3 trees, each one trained over a bootstrap of the data. Every tree remembers the instances left out of
+    its bootstrap, so the forest can estimate its own error on them (out-of-bag error)
+
+    """
+
+    __trees = []
+    __out_of_bag = []
+    __attributes = []
+    __class_attr = None
+
+    def __init__(self, data_handler, k, n_jobs=1, builder="recursive", limits=None, rng=random):
+        """
+        Constructor of the class
+
+        :param DataHandler data_handler: The training data
+        :param integer k: Number of trees
+        :param integer n_jobs: Number of processes, or a value below 1 to use all of the CPUs
+        :param string builder: How to grow the trees, as in ID3DecisionTree
+        :param dict limits: The growth limits of the trees, as keyword arguments of ID3DecisionTree, like
+        {"max_depth": 8, "min_samples_leaf": 5}
+        :param random.Random rng: The random generator drawing the seeds of the trees. Defaults to the global one
+        """
+
+        trained = train_trees(data_handler, k, n_jobs, builder, limits, rng)
+
+        self.__trees = [tree for tree, out_of_bag in trained]
+        self.__out_of_bag = [out_of_bag for tree, out_of_bag in trained]
+        self.__attributes = data_handler.attributes()
+        self.__class_attr = data_handler.class_attribute()
+
+    def save(self, path, cut_points=None):
+        """
+        Saves the trees of the forest to a binary model file. The out-of-bag indexes are not saved
+
+        :param string path: The file to write
+        :param dict cut_points: The discretization cut points of each attribute, like {<name>: [<cut point>, ...]}.
+        Defaults to the ones found in the trees
+        """
+
+        if cut_points is None:
+            cut_points = {}
+
+            for tree in self.__trees:
+                for attr, tree_cut_points in tree.cut_points().items():
+                    cut_points[attr] = sorted(set(cut_points.get(attr, [])).union(tree_cut_points))
+
+        save_trees(path, self.__trees, {"kind": "forest", "attributes": self.__attributes,
+                                        "class_attr": self.__class_attr, "cut_points": cut_points})
+
+    @staticmethod
+    def load(path):
+        """
+        Loads a forest saved by RandomForest.save, memory-mapping the file
+
+        :param string path: The file to read
+        :return: A tuple with the forest, which can classify but has no out-of-bag indexes, and the metadata of the file
+        :rtype: tuple
+        """
+
+        trees, metadata = load_trees(path)
+
+        if metadata.get("kind") != "forest":
+            raise AttributeError("Model kind is not supported!")
+
+        forest = RandomForest.__new__(RandomForest)
+
+        forest.__trees = trees
+        forest.__out_of_bag = [array.array("i") for tree in trees]
+        forest.__attributes = metadata["attributes"]
+        forest.__class_attr = metadata["class_attr"]
+
+        return forest, metadata
+
+    def __len__(self):
+        return len(self.__trees)
+
+    def trees(self):
+        return list(self.__trees)
+
+    def report(self):
+        """
+        Measures the size of the trees, which drives the memory the forest takes and the time to classify with it
+
+        :return: The number of "trees", their total "nodes" and "leaves", the "depth" of the deepest one and the mean
+        number of nodes ("mean_nodes") and depth ("mean_depth") of a tree
+        :rtype: dict
+        """
+
+        reports = [tree.report() for tree in self.__trees]
+        n_trees = max(len(reports), 1)
+
+        return {"trees": len(reports), "nodes": sum(report["nodes"] for report in reports),
+                "leaves": sum(report["leaves"] for report in reports),
+                "depth": max([report["depth"] for report in reports] or [0]),
+                "mean_nodes": sum(report["nodes"] for report in reports) / n_trees,
+                "mean_depth": sum(report["depth"] for report in reports) / n_trees}
+
+    def __vote(self, instance, classifications):
+        logger.debug("Classified " + str(instance) + " (by each of the trees) as " + str(classifications))
+
+        counter = {classification: classifications.count(classification) for classification in classifications}
+
+        return max(counter, key=lambda key: counter[key])
+
+    def classify_many(self, instances):
+        """
+        Classifies the instances by the majority vote of the trees
+
+        :param list instances: A list of attribute tuples like [(<attributes>), ...]
+        :return: The classification of each instance, in order
+        :rtype: list
+        """
+
+        trees_classifications = [tree.classify_many(instances) for tree in self.__trees]
+
+        return [self.__vote(instance, list(classifications))
+                for instance, classifications in zip(instances, zip(*trees_classifications))]
+
+    def classify_encoded(self, encoded):
+        """
+        Classifies many instances given as dictionary-encoded columns by the majority vote of the trees
+
+        :param list encoded: The attribute columns, as given by DataHandler.encoded_attributes
+        :return: The classification of each instance, in order
+        :rtype: list
+        """
+
+        trees_classifications = [tree.classify_encoded(encoded) for tree in self.__trees]
+
+        return [self.__vote(idx, list(classifications))
+                for idx, classifications in enumerate(zip(*trees_classifications))]
+
+    def classify(self, instance):
+        return self.classify_many([instance])[0]
+
+    def out_of_bag_classify(self, data_handler):
+        """
+        Classifies each training instance by the majority vote of the trees that did not see it in their bootstrap
+
+        :param DataHandler data_handler: The data the forest was trained on
+        :return: A tuple with a list of (<attributes>, <classification>) tuples and a list with the actual instances,
+        both holding only the instances left out of at least one bootstrap
+        :rtype: tuple
+        """
+
+        instances = data_handler.as_instances()
+        votes = [[] for instance in instances]
+
+        for tree, out_of_bag in zip(self.__trees, self.__out_of_bag):
+            classifications = tree.classify_many([instances[idx][0] for idx in out_of_bag])
+
+            for idx, classification in zip(out_of_bag, classifications):
+                votes[idx].append(classification)
+
+        classified = []
+        samples = []
+
+        for instance, classifications in zip(instances, votes):
+            if classifications:
+                classified.append((instance[0], self.__vote(instance[0], classifications)))
+                samples.append(instance)
+
+        return classified, samples
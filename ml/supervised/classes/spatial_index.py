@@ -0,0 +1,181 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import heapq
+import itertools
+
+# Relative slack when pruning by a lower bound, so rounding never discards a neighbor at the same distance
+EPSILON = 1e-9
+
+
+def euclidean_distance(pa, pb):
+    distance = 0
+
+    for idx, position in enumerate(pa):
+        distance += ((position - pb[idx]) ** 2)
+
+    return distance ** 0.5
+
+
+class SpatialIndex(object):
+    """
+    A binary space partitioning tree over a set of points, answering k nearest neighbor queries. The points are split
+    at the median of their widest dimension, and subclasses define the region that bounds each node
+
+    """
+
+    _points = []
+    _leaf_size = 16
+    _root = None
+
+    def __init__(self, points, leaf_size=16):
+        """
+        Constructor of the class
+
+        :param list points: The points to index, as tuples of coordinates
+        :param integer leaf_size: Maximum number of points in a leaf
+        """
+
+        self._points = [tuple(point) for point in points]
+        self._leaf_size = max(1, leaf_size)
+        self._root = self.__build(list(range(0, len(self._points)))) if self._points else None
+
+    def __build(self, idxs):
+        bound = self._bound(idxs)
+
+        if len(idxs) <= self._leaf_size:
+            return (bound, idxs)
+
+        dimensions = len(self._points[idxs[0]])
+        spreads = [max(self._points[idx][dim] for idx in idxs) - min(self._points[idx][dim] for idx in idxs)
+                   for dim in range(0, dimensions)]
+        split_dim = spreads.index(max(spreads))
+
+        idxs = sorted(idxs, key=lambda idx: self._points[idx][split_dim])
+        middle = len(idxs) // 2
+
+        return (bound, self.__build(idxs[:middle]), self.__build(idxs[middle:]))
+
+    def _bound(self, idxs):
+        raise NotImplementedError()
+
+    def _lower_bound(self, point, bound):
+        raise NotImplementedError()
+
+    def __len__(self):
+        return len(self._points)
+
+    def query(self, point, k):
+        """
+        Finds the k nearest points, visiting the nodes closest to the point first and skipping every node that can not
+        hold a point closer than the current k-th neighbor
+
+        :param tuple point: The query point
+        :param integer k: Number of neighbors
+        :return: A list of (<distance>, <index>) tuples, sorted by distance and, on ties, by index
+        :rtype: list
+        """
+
+        if k <= 0 or self._root is None:
+            return []
+
+        # Max-heap of the best neighbors so far, by (distance, index)
+        neighbors = []
+
+        counter = itertools.count()
+        pending = [(0, next(counter), self._root)]
+
+        while pending:
+            lower_bound, order, node = heapq.heappop(pending)
+
+            if len(neighbors) == k and self.__prunable(lower_bound, -neighbors[0][0]):
+                break
+
+            if len(node) == 2:
+                for idx in node[1]:
+                    distance = euclidean_distance(self._points[idx], point)
+
+                    if len(neighbors) < k:
+                        heapq.heappush(neighbors, (-distance, -idx))
+                    elif (distance, idx) < (-neighbors[0][0], -neighbors[0][1]):
+                        heapq.heapreplace(neighbors, (-distance, -idx))
+
+                continue
+
+            for child in node[1:]:
+                child_lower_bound = self._lower_bound(point, child[0])
+
+                if len(neighbors) < k or not self.__prunable(child_lower_bound, -neighbors[0][0]):
+                    heapq.heappush(pending, (child_lower_bound, next(counter), child))
+
+        return sorted((-distance, -idx) for distance, idx in neighbors)
+
+    def __prunable(self, lower_bound, distance):
+        return lower_bound > distance + EPSILON * (1 + distance)
+
+
+class KDTree(SpatialIndex):
+    """
+    A KD-tree, bounding each node by the box around its points. Best suited to low dimensional data
+
+    """
+
+    def _bound(self, idxs):
+        points = [self._points[idx] for idx in idxs]
+
+        return [min(coordinates) for coordinates in zip(*points)], [max(coordinates) for coordinates in zip(*points)]
+
+    def _lower_bound(self, point, bound):
+        distance = 0
+
+        for position, lower, upper in zip(point, bound[0], bound[1]):
+            if position < lower:
+                distance += (lower - position) ** 2
+            elif position > upper:
+                distance += (position - upper) ** 2
+
+        return distance ** 0.5
+
+
+class BallTree(SpatialIndex):
+    """
+    A ball tree, bounding each node by the sphere around the centroid of its points. Keeps pruning in higher dimensions,
+    where boxes get loose
+
+    """
+
+    def _bound(self, idxs):
+        points = [self._points[idx] for idx in idxs]
+        centroid = tuple(sum(coordinates) / len(points) for coordinates in zip(*points))
+
+        return centroid, max(euclidean_distance(point, centroid) for point in points)
+
+    def _lower_bound(self, point, bound):
+        return max(0, euclidean_distance(point, bound[0]) - bound[1])
+
+
+supported_indexes = ["kd_tree", "ball_tree", "auto"]
+
+
+def build_index(points, index="auto", leaf_size=16):
+    """
+    Builds a spatial index over the points
+
+    :param list points: The points to index, as tuples of coordinates
+    :param string index: The kind of index. Options are "kd_tree", "ball_tree" and "auto", which picks a KD-tree for up
+    to 10 dimensions and a ball tree otherwise
+    :param integer leaf_size: Maximum number of points in a leaf
+    :return: The index
+    :rtype: SpatialIndex
+    """
+
+    if index == "auto":
+        index = "kd_tree" if not points or len(points[0]) <= 10 else "ball_tree"
+
+    if index == "kd_tree":
+        return KDTree(points, leaf_size)
+    elif index == "ball_tree":
+        return BallTree(points, leaf_size)
+
+    raise AttributeError("Index is not supported!")
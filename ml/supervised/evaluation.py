@@ -2,64 +2,157 @@
 
 from __future__ import division
 from __future__ import print_function
+import logging
+import random
+
 from ml.supervised.algorithms import knn_classification, id3_decision_tree, id3_random_forest
+from ml.supervised.classes.neighbors import vote
+from ml.supervised.classes.random_forest import RandomForest
+from ml.supervised.parallel import split_budget, ordered_map
+from data.columnar import np
+
+logger = logging.getLogger("main")
+
+
+def __knn_fold(task):
+    """
+    Classifies one fold with kNN, trained on the other folds
+
+    :param tuple task: The data handler, the folds (as instance indexes), the index of the test fold, the k factor and
+    the neighbor search algorithm
+    :return: The measures of the fold
+    :rtype: dict
+    """
+
+    data_handler, folds, idx_fold, knn_factor, algorithm = task
+
+    train_handler, test_handler = data_handler.fold_split(folds, idx_fold)
+
+    fold = test_handler.as_instances()
+    test_instances = [instance[0] for instance in fold]
+
+    train_instances = list(train_handler.as_instances())
+
+    # With a spatial index, it is built once for the fold and queried by each of its test instances
+    classified_instances = knn_classification(train_instances, test_instances, knn_factor, algorithm)
+
+    return __knn_measures(classified_instances, fold)
+
+
+def __knn_measures(classified_instances, fold):
+    # Compare classified instances with the test set
+    correct_classifications = 0
+    true_positive = 0
+    false_positive = 0
+    false_negative = 0
+    true_negative = 0
+
+    for (predicted_instance, test_instance) in zip(classified_instances, fold):
+        if predicted_instance[1] == test_instance[1]:
+            correct_classifications += 1
+            if predicted_instance[1] == 1:
+                true_positive += 1
+            else:
+                true_negative += 1
+
+        elif predicted_instance[1] == 1:
+            false_positive += 1
+
+        elif predicted_instance[1] == 0:
+            false_negative += 1
+
+    # Generate the statistics
+    acc = correct_classifications / len(classified_instances)
 
+    rev = true_positive / (true_positive + false_negative)
 
-def knn_kcrossvalidation(data_handler, knn_factor, k_folds):
-    folds = data_handler.stratify(k_folds)
+    prec = true_positive / (true_positive + false_positive)
+
+    f_measure = 2 * (prec * rev) / (prec + rev)
+
+    return {"acc": acc, "f-measure": f_measure}
+
+
+def knn_kcrossvalidation(data_handler, knn_factor, k_folds, n_jobs=1, executor="serial", algorithm="brute",
+                         distances=None):
+    """
+    :param data_handler: Raw data for the cross validation
+    :param knn_factor: The k factor for the kNN algorithm
+    :param k_folds: Number of folds to generate
+    :param n_jobs: Number of workers running the folds, or a value below 1 to use all of the CPUs
+    :param executor: How to run the folds. Options are "serial", "threads" and "processes"
+    :param algorithm: How to search the neighbors, as in knn_classification
+    :param distances: A DistanceCache of the data handler instances. If given, the neighbors come from it, instead of
+    being searched with the algorithm
+    :return: The measures of each fold, in fold order
+    """
+    if distances is not None:
+        return knn_factors_kcrossvalidation(data_handler, [knn_factor], k_folds, distances)[knn_factor]
+
+    folds = data_handler.stratified_indexes(k_folds)
 
     measures = {"acc": [], "f-measure": []}
 
-    for idx_fold, fold in enumerate(folds):
-        aux_folds = list(folds)  # Copy the folds
-        test_instances = [instance[0] for instance in aux_folds.pop(idx_fold)]
+    fold_jobs = split_budget(n_jobs, len(folds), executor)[0]
 
-        train_instances = []
-        for aux_fold in aux_folds:
-            train_instances += aux_fold
+    tasks = [(data_handler, folds, idx_fold, knn_factor, algorithm) for idx_fold in range(0, len(folds))]
 
-        classified_instances = knn_classification(train_instances, test_instances, knn_factor)
+    for fold_measures in ordered_map(__knn_fold, tasks, executor, fold_jobs):
+        measures["acc"].append(fold_measures["acc"])
+        measures["f-measure"].append(fold_measures["f-measure"])
 
-        # Compare classified instances with the test set
-        correct_classifications = 0
-        true_positive = 0
-        false_positive = 0
-        false_negative = 0
-        true_negative = 0
+    return measures
 
-        for (predicted_instance, test_instance) in zip(classified_instances, fold):
-            if predicted_instance[1] == test_instance[1]:
-                correct_classifications += 1
-                if predicted_instance[1] == 1:
-                    true_positive += 1
-                else:
-                    true_negative += 1
 
-            elif predicted_instance[1] == 1:
-                false_positive += 1
+def knn_factors_kcrossvalidation(data_handler, knn_factors, k_folds, distances):
+    """
+    Cross validates several k factors in one sweep over a DistanceCache: the test instances of each fold are masked
+    out of the cached distances, their neighbors are found once for the largest factor, and each factor votes among
+    its nearest ones. Ties between distances are broken by the order of the instances in the data set
 
-            elif predicted_instance[1] == 0:
-                false_negative += 1
+    :param data_handler: Raw data for the cross validation
+    :param knn_factors: The k factors to evaluate
+    :param k_folds: Number of folds to generate
+    :param distances: A DistanceCache of the data handler instances
+    :return: The measures of each fold, in fold order, by k factor
+    :rtype: dict { k: {"acc": [...], "f-measure": [...]}, ... }
+    """
+    instances = data_handler.as_instances()
+    folds = data_handler.stratified_indexes(k_folds)
 
-        # Generate the statistics
-        acc = correct_classifications / len(classified_instances)
-        measures["acc"].append(acc)
+    classes = data_handler.possible_classes()
+    class_codes = {yi: code for code, yi in enumerate(classes)}
+    codes = np.array([class_codes[instance[1]] for instance in instances], dtype=np.intp)
 
-        rev = true_positive / (true_positive + false_negative)
+    measures = {knn_factor: {"acc": [], "f-measure": []} for knn_factor in knn_factors}
 
-        prec = true_positive / (true_positive + false_positive)
+    for idx_fold, test_rows in enumerate(folds):
+        train_rows = [row for idx, fold in enumerate(folds) if idx != idx_fold for row in fold]
 
-        f_measure = 2 * (prec * rev) / (prec + rev)
-        measures["f-measure"].append(f_measure)
+        neighbor_rows = distances.neighbors(test_rows, train_rows, max(knn_factors))
+
+        fold = [instances[row] for row in test_rows]
+
+        for knn_factor in knn_factors:
+            winners = vote(codes[neighbor_rows[:, :knn_factor]], len(classes))
+
+            classified_instances = [(instance[0], classes[winner]) for instance, winner in zip(fold, winners)]
+
+            fold_measures = __knn_measures(classified_instances, fold)
+
+            measures[knn_factor]["acc"].append(fold_measures["acc"])
+            measures[knn_factor]["f-measure"].append(fold_measures["f-measure"])
 
     return measures
 
 
-def knn_repeatedkcrossvalidation(data_transformer, knn_factor, k_folds, repetitions):
+def knn_repeatedkcrossvalidation(data_transformer, knn_factor, k_folds, repetitions, n_jobs=1, executor="serial",
+                                 algorithm="brute", distances=None):
     measures = {"acc": [], "f-measure": []}
 
     for i in range(0, repetitions):
-        fold_measures = knn_kcrossvalidation(data_transformer, knn_factor, k_folds)
+        fold_measures = knn_kcrossvalidation(data_transformer, knn_factor, k_folds, n_jobs, executor, algorithm,
+                                             distances)
 
         measures["acc"] += fold_measures["acc"]
         measures["f-measure"] += fold_measures["f-measure"]
@@ -67,27 +160,68 @@ def knn_repeatedkcrossvalidation(data_transformer, knn_factor, k_folds, repetiti
     return measures
 
 
-def decision_tree_kcrossvalidation(data_handler, k_folds):
+def knn_factors_repeatedkcrossvalidation(data_transformer, knn_factors, k_folds, repetitions, distances):
     """
-    :param data_handler: Raw data for the cross validation
-    :param k_folds: Number of folds to generate
-    :return: List of tuples with values for accuracy and the F-measure
+    Repeats knn_factors_kcrossvalidation, reusing the same DistanceCache in every repetition
+
+    :return: The measures of each fold of each repetition, by k factor
+    :rtype: dict { k: {"acc": [...], "f-measure": [...]}, ... }
     """
-    folds = data_handler.stratify(k_folds)
-    folds_measures = {"acc": [], "f-measure": [], "recall": [], "precision": []}
+    measures = {knn_factor: {"acc": [], "f-measure": []} for knn_factor in knn_factors}
+
+    for i in range(0, repetitions):
+        factors_measures = knn_factors_kcrossvalidation(data_transformer, knn_factors, k_folds, distances)
+
+        for knn_factor in knn_factors:
+            measures[knn_factor]["acc"] += factors_measures[knn_factor]["acc"]
+            measures[knn_factor]["f-measure"] += factors_measures[knn_factor]["f-measure"]
+
+    return measures
+
+
+def __tree_fold(task):
+    """
+    Classifies one fold with a decision tree or a random forest, trained on the other folds
+
+    :param tuple task: The data handler, the folds, the index of the test fold, the fold random seed, the number of
+    trees (None for a single decision tree), the number of workers training the trees, how to grow them and their
+    growth limits
+    :return: The measures of the fold
+    :rtype: dict
+    """
+
+    data_handler, folds, index_fold, seed, k_trees, n_jobs, builder, limits = task
+
+    # Each fold draws from its own generator, so the results don't depend on which worker runs it, nor on the other
+    # folds running along in threads
+    rng = random.Random(seed)
+
+    train_handler, test_handler = data_handler.fold_split(folds, index_fold)
+
+    # Train the algorithm & Classify the test fold
+    if k_trees is None:
+        classified_samples = id3_decision_tree(train_handler, test_handler, builder, limits, rng)
+    else:
+        classified_samples = id3_random_forest(train_handler, test_handler, k_trees, n_jobs, builder, limits, rng)
+
+    return validate(classified_samples, test_handler.as_instances(), train_handler.possible_classes())
 
-    for index_fold, fold in enumerate(folds):
-        aux_folds = list(folds)  # Copy the folds
-        test_fold = [aux_folds.pop(index_fold)]
 
-        test_handler = data_handler.fold_handler(test_fold)
-        train_handler = data_handler.fold_handler(aux_folds)
+def __tree_kcrossvalidation(data_handler, k_folds, k_trees, n_jobs, executor, builder, limits):
+    # The folds and the seeds of the folds come from a single draw of the global random state, so a given seed gives
+    # the same measures with any executor and number of workers
+    rng = random.Random(random.randrange(2 ** 31))
 
-        # Train the algorithm & Classify the test fold
-        test_instances = [instance[0] for instance in test_handler.as_instances()]
-        classified_samples = id3_decision_tree(train_handler, test_instances)
+    folds = data_handler.stratified_indexes(k_folds, rng)
+    folds_measures = {"acc": [], "f-measure": [], "recall": [], "precision": []}
+
+    # Folds and the trees of each fold share the workers
+    fold_jobs, tree_jobs = split_budget(n_jobs, len(folds), executor)
+
+    tasks = [(data_handler, folds, index_fold, rng.randrange(2 ** 31), k_trees, tree_jobs, builder, limits)
+             for index_fold in range(0, len(folds))]
 
-        measures = validate(classified_samples, test_handler.as_instances(), train_handler.possible_classes())
+    for measures in ordered_map(__tree_fold, tasks, executor, fold_jobs):
         folds_measures["acc"].append(measures["acc"])
         folds_measures["f-measure"].append((measures["f-measure"]))
         folds_measures["recall"].append(measures["recall"])
@@ -95,33 +229,58 @@ def decision_tree_kcrossvalidation(data_handler, k_folds):
     return folds_measures
 
 
-def random_forest_kcrossvalidation(data_handler, k_folds, k_trees):
+def decision_tree_kcrossvalidation(data_handler, k_folds, n_jobs=1, executor="serial", builder="recursive",
+                                   limits=None):
+    """
+    :param data_handler: Raw data for the cross validation
+    :param k_folds: Number of folds to generate
+    :param n_jobs: Number of workers running the folds, or a value below 1 to use all of the CPUs
+    :param executor: How to run the folds. Options are "serial", "threads" and "processes"
+    :param builder: How to grow the trees. Options are "recursive", "level_wise" and "histogram" (the last two require
+    the columnar backend)
+    :param limits: The growth limits of the trees, as keyword arguments of ID3DecisionTree, like {"max_depth": 8}
+    :return: List of tuples with values for accuracy and the F-measure
+    """
+    return __tree_kcrossvalidation(data_handler, k_folds, None, n_jobs, executor, builder, limits)
+
+
+def random_forest_kcrossvalidation(data_handler, k_folds, k_trees, n_jobs=1, executor="serial", builder="recursive",
+                                   limits=None):
     """
     :param data_handler: Raw data for the cross validation
     :param k_folds: Number of folds to generate
     :param k_trees: Number of trees in the forest
+    :param n_jobs: Number of workers, shared by the folds and the trees of each forest, or a value below 1 to use all
+    of the CPUs
+    :param executor: How to run the folds. Options are "serial", "threads" and "processes"
+    :param builder: How to grow the trees. Options are "recursive", "level_wise" and "histogram" (the last two require
+    the columnar backend)
+    :param limits: The growth limits of the trees, as keyword arguments of ID3DecisionTree, like {"max_depth": 8}
     :return: List of tuple with values for accuracy and the F-measure
     """
-    folds = data_handler.stratify(k_folds)
-    folds_measures = {"acc": [], "f-measure": [], "recall": [], "precision": []}
+    return __tree_kcrossvalidation(data_handler, k_folds, k_trees, n_jobs, executor, builder, limits)
 
-    for index_fold, fold in enumerate(folds):
-        aux_folds = list(folds)  # Copy the folds
-        test_fold = [aux_folds.pop(index_fold)]
 
-        test_handler = data_handler.fold_handler(test_fold)
-        train_handler = data_handler.fold_handler(aux_folds)
+def random_forest_oob(data_handler, k_trees, n_jobs=1, builder="recursive", limits=None):
+    """
+    Estimates the error of a random forest from its training alone: each instance is classified only by the trees whose
+    bootstrap left it out, so no data has to be held out in folds
 
-        # Train the algorithm & Classify the test fold
-        test_instances = [instance[0] for instance in test_handler.as_instances()]
-        classified_samples = id3_random_forest(train_handler, test_instances, k_trees)
+    :param data_handler: Raw data to train the forest
+    :param k_trees: Number of trees in the forest
+    :param n_jobs: Number of processes training the trees, or a value below 1 to use all of the CPUs
+    :param builder: How to grow the trees. Options are "recursive", "level_wise" and "histogram" (the last two require
+    the columnar backend)
+    :param limits: The growth limits of the trees, as keyword arguments of ID3DecisionTree, like {"max_depth": 8}
+    :return: The measures over the out-of-bag instances
+    """
+    forest = RandomForest(data_handler, k_trees, n_jobs, builder, limits)
 
-        measures = validate(classified_samples, test_handler.as_instances(), train_handler.possible_classes())
-        folds_measures["acc"].append(measures["acc"])
-        folds_measures["f-measure"].append((measures["f-measure"]))
-        folds_measures["recall"].append(measures["recall"])
-        folds_measures["precision"].append(measures["precision"])
-    return folds_measures
+    logger.info("Forest report: " + str(forest.report()))
+
+    classified_samples, samples = forest.out_of_bag_classify(data_handler)
+
+    return validate(classified_samples, samples, data_handler.possible_classes())
 
 
 def validate(predicted_samples, test_samples, classes):
@@ -178,7 +337,7 @@ def validate(predicted_samples, test_samples, classes):
     measures["recall"] = rev
     measures["precision"] = prec
 
-    if correct_classifications == 0:
+    if correct_classifications == 0 or prec + rev == 0:
         f_measure = 0
     else:
         f_measure = 2 * (prec * rev) / (prec + rev)
@@ -0,0 +1,94 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import concurrent.futures
+import multiprocessing
+
+supported_executors = ["serial", "threads", "processes"]
+
+
+class SerialExecutor(object):
+    """
+    An executor that runs every task in the calling thread, in order
+
+    """
+
+    def map(self, function, *iterables):
+        return list(map(function, *iterables))
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def resolve_jobs(n_jobs):
+    """
+    :param integer n_jobs: A number of workers, or a value below 1 to use all of the CPUs
+    :return: The number of workers
+    :rtype: integer
+    """
+
+    if n_jobs is None or n_jobs < 1:
+        return multiprocessing.cpu_count()
+
+    return n_jobs
+
+
+def split_budget(n_jobs, n_tasks, executor="serial"):
+    """
+    Shares a global budget of workers between the tasks run by an executor and the work nested inside each task, so
+    both levels together never use more than the budget
+
+    :param integer n_jobs: The global number of workers, or a value below 1 to use all of the CPUs
+    :param integer n_tasks: Number of tasks given to the executor
+    :param string executor: The kind of executor. Options are "serial", "threads" and "processes"
+    :return: A tuple with the workers of the executor and the workers left for each task
+    :rtype: tuple
+    """
+
+    budget = resolve_jobs(n_jobs)
+
+    if executor == "serial":
+        return 1, budget
+
+    outer_jobs = max(1, min(budget, n_tasks))
+
+    return outer_jobs, max(1, budget // outer_jobs)
+
+
+def make_executor(executor, n_workers):
+    """
+    :param string executor: The kind of executor. Options are "serial", "threads" and "processes"
+    :param integer n_workers: Number of workers of the executor
+    :return: An executor, with the map and shutdown methods of concurrent.futures
+    """
+
+    if executor == "serial" or n_workers <= 1:
+        return SerialExecutor()
+    elif executor == "threads":
+        return concurrent.futures.ThreadPoolExecutor(n_workers)
+    elif executor == "processes":
+        return concurrent.futures.ProcessPoolExecutor(n_workers)
+
+    raise AttributeError("Executor is not supported!")
+
+
+def ordered_map(function, tasks, executor="serial", n_workers=1):
+    """
+    Runs a function over the tasks with an executor, collecting the results in the order of the tasks no matter the
+    order in which they finish
+
+    :param function function: The function to run, which must be picklable for the "processes" executor
+    :param list tasks: The argument of each call
+    :param string executor: The kind of executor. Options are "serial", "threads" and "processes"
+    :param integer n_workers: Number of workers of the executor
+    :return: The results, in the order of the tasks
+    :rtype: list
+    """
+
+    pool = make_executor(executor, n_workers)
+
+    try:
+        return list(pool.map(function, tasks))
+    finally:
+        pool.shutdown(wait=True)